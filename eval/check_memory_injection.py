@@ -1,34 +1,73 @@
 #!/usr/bin/env python3
 """Demonstrate that memories are properly retrieved and injected into prompts."""
 
+import functools
+import itertools
+import json
 import sqlite3
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from rich.console import Console
+from rich.console import Console, Group
 from rich.panel import Panel
 from rich.table import Table
 from rich import box
 
 console = Console()
 
+# Renderables collected section by section and emitted in a single print
+report = []
+
+
+@functools.lru_cache(maxsize=1024)
+def _loads_ids(raw: str) -> tuple[str, ...]:
+    """Parse a memories_retrieved JSON array, memoized across identical rows."""
+    return tuple(json.loads(raw))
+
+
 # Connect to the eval database
 db = sqlite3.connect("eval_memory.db")
 db.row_factory = sqlite3.Row
 
-console.print(Panel("[bold cyan]Memory Retrieval Demonstration[/bold cyan]\nShowing how memories are retrieved and injected into the system prompt", box=box.DOUBLE))
+# Tune the connection for a read-heavy scan: WAL, big page cache, mmap'd reads
+for pragma in (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "cache_size=-65536",
+    "temp_store=MEMORY",
+    "mmap_size=268435456",
+):
+    db.execute(f"PRAGMA {pragma}")
+
+# Databases written before the retrieved_count column get it counted from the JSON array
+has_retcount = db.execute(
+    "SELECT 1 FROM pragma_table_info('turns') WHERE name = 'retrieved_count'"
+).fetchone() is not None
+retrieved_count = "retrieved_count" if has_retcount else "json_array_length(memories_retrieved)"
+
+# Index the report's hot-path filters so they stay index probes on large DBs
+db.execute("CREATE INDEX IF NOT EXISTS idx_mem_active_turn ON memories(is_active, source_turn)")
+if has_retcount:
+    db.execute("CREATE INDEX IF NOT EXISTS idx_turns_retcount ON turns(role, retrieved_count)")
+db.executescript("""
+    ANALYZE memories;
+    ANALYZE turns;
+""")
+
+report.append(Panel("[bold cyan]Memory Retrieval Demonstration[/bold cyan]\nShowing how memories are retrieved and injected into the system prompt", box=box.DOUBLE))
 
 # 1. Show stored memories
-console.print("\n[bold]📦 Step 1: Memories Stored in Database[/bold]")
+report.append("\n[bold]📦 Step 1: Memories Stored in Database[/bold]")
 memories = db.execute("""
-    SELECT id, type, key, value, source_turn, confidence 
+    SELECT id, type, key, substr(value, 1, 40) AS v_short,
+           length(value) AS v_len, source_turn
     FROM memories 
     WHERE is_active = 1 
     ORDER BY source_turn 
     LIMIT 10
-""").fetchall()
+""")
 
 mem_table = Table(box=box.SIMPLE)
 mem_table.add_column("ID", style="dim")
@@ -42,33 +81,34 @@ for m in memories:
         m["id"][:12],
         m["type"],
         m["key"],
-        m["value"][:40] + "..." if len(m["value"]) > 40 else m["value"],
+        m["v_short"] + "..." if m["v_len"] > 40 else m["v_short"],
         str(m["source_turn"])
     )
 
-console.print(mem_table)
+report.append(mem_table)
 
 # 2. Show retrieval examples
-console.print("\n[bold]🔍 Step 2: Memories Retrieved for Queries[/bold]")
-console.print("[dim]Showing which memories were retrieved for different user queries[/dim]\n")
+report.append("\n[bold]🔍 Step 2: Memories Retrieved for Queries[/bold]")
+report.append("[dim]Showing which memories were retrieved for different user queries[/dim]\n")
 
-retrieval_examples = db.execute("""
-    SELECT turn_id, content, memories_retrieved 
+retrieval_examples = db.execute(f"""
+    SELECT turn_id, substr(content, 1, 60) AS content_preview,
+           memories_retrieved, {retrieved_count} AS retrieved_count
     FROM turns 
-    WHERE role = 'user' AND memories_retrieved != '[]' 
+    WHERE role = 'user' AND {retrieved_count} > 0 
+    ORDER BY turn_id
     LIMIT 5
-""").fetchall()
+""")
 
 for ex in retrieval_examples:
-    import json
-    mem_ids = json.loads(ex["memories_retrieved"])
+    mem_ids = _loads_ids(ex["memories_retrieved"])
     
-    console.print(f"[yellow]Turn {ex['turn_id']}:[/yellow] {ex['content'][:60]}...")
-    console.print(f"  [dim]→ Retrieved {len(mem_ids)} memories: {', '.join([m[:10] for m in mem_ids[:3]])}...[/dim]\n")
+    report.append(f"[yellow]Turn {ex['turn_id']}:[/yellow] {ex['content_preview']}...")
+    report.append(f"  [dim]→ Retrieved {ex['retrieved_count']} memories: {', '.join(m[:10] for m in itertools.islice(mem_ids, 3))}...[/dim]\n")
 
 # 3. Show how it's injected
-console.print("\n[bold]💉 Step 3: How Memories Are Injected[/bold]")
-console.print("""
+report.append("\n[bold]💉 Step 3: How Memories Are Injected[/bold]")
+report.append("""
 [dim]The agent follows this flow for EVERY turn:[/dim]
 
 1. User sends query: "What's the fastest animal?"
@@ -91,17 +131,22 @@ console.print("""
 """)
 
 # 4. Verify injection actually happened
-console.print("\n[bold]✅ Step 4: Verification[/bold]")
+report.append("\n[bold]✅ Step 4: Verification[/bold]")
 
-total_turns = db.execute("SELECT COUNT(*) FROM turns WHERE role = 'user'").fetchone()[0]
-turns_with_retrieval = db.execute("SELECT COUNT(*) FROM turns WHERE role = 'user' AND memories_retrieved != '[]'").fetchone()[0]
+total_memories = db.execute("SELECT COUNT(*) FROM memories WHERE is_active = 1").fetchone()[0]
+total_turns, turns_with_retrieval = db.execute(f"""
+    SELECT COUNT(*),
+           COALESCE(SUM(CASE WHEN {retrieved_count} > 0 THEN 1 ELSE 0 END), 0)
+    FROM turns
+    WHERE role = 'user'
+""").fetchone()
 
 verification_table = Table(box=box.SIMPLE_HEAVY)
 verification_table.add_column("Metric", style="cyan")
 verification_table.add_column("Value", justify="right", style="green")
 verification_table.add_column("Status", style="yellow")
 
-verification_table.add_row("Total Memories Stored", str(len(memories)), "✓ Active")
+verification_table.add_row("Total Memories Stored", str(total_memories), "✓ Active")
 verification_table.add_row("Total User Turns", str(total_turns), "✓ Logged")
 verification_table.add_row("Turns with Retrieval", str(turns_with_retrieval), "✓ Injected")
 verification_table.add_row(
@@ -110,9 +155,11 @@ verification_table.add_row(
     "✓ Working" if turns_with_retrieval > 0 else "⚠ Check"
 )
 
-console.print(verification_table)
+report.append(verification_table)
+
+report.append(f"\n[bold green]✓ Confirmed:[/bold green] Memories are being retrieved and injected into the system prompt!")
+report.append(f"[dim]Out of {total_turns} turns, {turns_with_retrieval} had memories injected ({turns_with_retrieval/total_turns*100:.0f}%)[/dim]")
 
-console.print(f"\n[bold green]✓ Confirmed:[/bold green] Memories are being retrieved and injected into the system prompt!")
-console.print(f"[dim]Out of {total_turns} turns, {turns_with_retrieval} had memories injected ({turns_with_retrieval/total_turns*100:.0f}%)[/dim]")
+console.print(Group(*report))
 
 db.close()
@@ -67,20 +67,28 @@ def generate_conversation(output_path: str = "eval/conversation_1000.json"):
     with open("eval/scenarios.json") as f:
         scenarios = json.load(f)
     
-    plants = {p["turn"]: p for p in scenarios["plants"]}
-    probes = {p["turn"]: p for p in scenarios["probes"]}
+    # Index scripted turns by turn id (turns are contiguous small ints)
+    plants = [None] * 1001
+    for p in scenarios["plants"]:
+        plants[p["turn"]] = p
+    probes = [None] * 1001
+    for p in scenarios["probes"]:
+        probes[p["turn"]] = p
     
     conversation = []
     
+    # Draw filler picks in one call up front (one per turn is an upper bound)
+    filler = iter(random.choices(FILLER_MESSAGES, k=1000))
+    
     for turn_id in range(1, 1001):
-        if turn_id in plants:
+        if plants[turn_id] is not None:
             msg = plants[turn_id]["content"]
             msg_type = "plant"
-        elif turn_id in probes:
+        elif probes[turn_id] is not None:
             msg = probes[turn_id]["content"]
             msg_type = "probe"
         else:
-            msg = random.choice(FILLER_MESSAGES)
+            msg = next(filler)
             msg_type = "filler"
         
         conversation.append({
@@ -92,10 +100,11 @@ def generate_conversation(output_path: str = "eval/conversation_1000.json"):
     
     Path(output_path).parent.mkdir(exist_ok=True)
     with open(output_path, "w") as f:
-        json.dump(conversation, f, indent=2)
+        # Compact: the file is only read programmatically
+        json.dump(conversation, f, separators=(",", ":"))
     
-    plant_count = len(plants)
-    probe_count = len(probes)
+    plant_count = len(scenarios["plants"])
+    probe_count = len(scenarios["probes"])
     filler_count = 1000 - plant_count - probe_count
     print(f"Generated 1000-turn conversation:")
     print(f"  Plants: {plant_count}")
@@ -25,6 +25,9 @@ def generate_quick_conversation():
     
     conversation = []
     
+    # Draw filler picks in one call up front (one per turn is an upper bound)
+    filler = iter(random.choices(FILLER_MESSAGES, k=50))
+    
     # Generate 50 turns
     for turn_id in range(1, 51):
         if turn_id in plants:
@@ -34,7 +37,7 @@ def generate_quick_conversation():
             msg = probes[turn_id]["content"]
             msg_type = "probe"
         else:
-            msg = random.choice(FILLER_MESSAGES)
+            msg = next(filler)
             msg_type = "filler"
         
         conversation.append({
@@ -45,7 +48,8 @@ def generate_quick_conversation():
         })
     
     with open(output_path, "w") as f:
-        json.dump(conversation, f, indent=2)
+        # Compact: the file is only read programmatically
+        json.dump(conversation, f, separators=(",", ":"))
     
     print(f"Generated 50-turn conversation to {output_path}")
 
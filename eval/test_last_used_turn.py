@@ -16,6 +16,8 @@ console = Console()
 def test_last_used_turn():
     """Test that last_used_turn is tracked correctly."""
     
+    # A single scenario whose steps depend on each other (plant → distill →
+    # recall against the same agent), so the calls run serially by design
     # Create agent with test database
     agent = LongMemAgent(
         provider="groq",
@@ -1,17 +1,20 @@
 """Interactive CLI for the long-form memory agent."""
 
+from __future__ import annotations
+
 import argparse
 import os
 import sys
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
-from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
-from rich.text import Text
-from rich import box
 
-from src.agent import LongMemAgent
+# Metadata line under each reply: turn, context use, latency, memories, flush marker
+_META_FMT = "Turn {} │ Ctx: {} │ {:.0f}ms │ Mems: {}{}"
+
+if TYPE_CHECKING:
+    from rich.console import Console
+    from src.agent import LongMemAgent
 
 
 def main():
@@ -23,6 +26,7 @@ def main():
     parser.add_argument("--base-url", help="Base URL for the LLM API (e.g. http://localhost:11434/v1 for Ollama)")
     parser.add_argument("--model", default="llama-3.1-8b-instant", help="Model name to use")
     parser.add_argument("--db", default="memory.db", help="Path to database file")
+    parser.add_argument("--quiet", action="store_true", help="Print bare replies instead of panels with turn metadata")
     args = parser.parse_args()
     
     # Handle local shorthand
@@ -39,17 +43,24 @@ def main():
             print("Error: Set GROQ_API_KEY in .env file to use Groq, or specify another --provider")
             sys.exit(1)
     
+    # Heavy imports only once the arguments are known to be usable
+    from rich.console import Console
+    from rich.panel import Panel
+    from rich import box
+    from src.agent import LongMemAgent
+    
     console = Console()
     
-    console.print(Panel(
-        "[bold cyan]Long-Form Memory Agent[/bold cyan]\n"
-        "Type your messages. Info from turn 1 will be recalled at turn 1000.\n"
-        "Commands: [dim]/memories[/dim] — show all  |  "
-        "[dim]/distill[/dim] — extract memories now  |  "
-        "[dim]/snapshot[/dim] — save snapshot  |  "
-        "[dim]/quit[/dim] — exit",
-        box=box.DOUBLE,
-    ))
+    if not args.quiet:
+        console.print(Panel(
+            "[bold cyan]Long-Form Memory Agent[/bold cyan]\n"
+            "Type your messages. Info from turn 1 will be recalled at turn 1000.\n"
+            "Commands: [dim]/memories[/dim] — show all  |  "
+            "[dim]/distill[/dim] — extract memories now  |  "
+            "[dim]/snapshot[/dim] — save snapshot  |  "
+            "[dim]/quit[/dim] — exit",
+            box=box.DOUBLE,
+        ))
     
     agent = LongMemAgent(
         provider=args.provider,
@@ -63,75 +74,69 @@ def main():
         console.print(f"[dim]Resuming conversation from turn {agent.turn_id}. "
                      f"Active memories: {agent.store.active_count()}[/dim]\n")
     
-    while True:
-        try:
+    try:
+        while True:
             user_input = console.input("\n[bold green]You:[/bold green] ").strip()
-        except (EOFError, KeyboardInterrupt):
-            console.print("\n[dim]Goodbye.[/dim]")
-            break
-        
-        if not user_input:
-            continue
-        
-        # Handle commands
-        if user_input.lower() == "/quit":
-            console.print("[dim]Goodbye.[/dim]")
-            break
-        
-        if user_input.lower() == "/memories":
-            _show_memories(console, agent)
-            continue
-        
-        if user_input.lower() == "/distill":
-            _distill_memories(console, agent)
-            continue
-        
-        if user_input.lower() == "/snapshot":
-            agent.store.write_snapshot(agent.turn_id)
-            console.print(f"[dim]Snapshot saved to snapshots/turn_{agent.turn_id:05d}.md[/dim]")
-            continue
-
-      
-        # Normal conversation
-        result = agent.chat(user_input)
-        
-        # Display response
-        response_text = result["response"]
-        
-        # Build metadata line
-        meta_parts = [
-            f"Turn {result['turn_id']}",
-            f"Ctx: {result['context_utilization']}",
-            f"{result['total_ms']:.0f}ms",
-            f"Mems: {result['total_memories']}",
-        ]
-        if result["flush_triggered"]:
-            meta_parts.append("⚡ FLUSH")
-        
-        meta_line = " │ ".join(meta_parts)
-        
-        # Show retrieved memories if any
-        if result["active_memories"]:
-            mem_text = "  🧠 "
-            mem_parts = [
-                f"[dim]{m['content']}[/dim] (t{m['origin_turn']})"
-                for m in result["active_memories"]
-            ]
-            mem_text += " · ".join(mem_parts)
-        else:
-            mem_text = ""
-        
-        panel_content = f"{response_text}"
-        if mem_text:
-            panel_content += f"\n\n{mem_text}"
-        
-        console.print(Panel(
-            panel_content,
-            title=f"[bold blue]Assistant[/bold blue]",
-            subtitle=f"[dim]{meta_line}[/dim]",
-            box=box.ROUNDED,
-            padding=(0, 1),
-        ))
+
+            if not user_input:
+                continue
+
+            # Handle commands (only slash-prefixed input can be one)
+            if user_input[0] == "/":
+                command = _COMMANDS.get(user_input.split(None, 1)[0].lower())
+                if command is not None:
+                    if command(console, agent) is False:
+                        break
+                    continue
+
+            # Normal conversation
+            result = agent.chat(user_input)
+
+            # Display response
+            response_text = result["response"]
+            if args.quiet:
+                print(response_text)
+                continue
+
+            # Build metadata line
+            meta_line = _META_FMT.format(
+                result["turn_id"],
+                result["context_utilization_str"],
+                result["total_ms"],
+                result["total_memories"],
+                " │ ⚡ FLUSH" if result["flush_triggered"] else "",
+            )
+
+            # Show retrieved memories if any
+            panel_content = response_text
+            if result["active_memories"]:
+                panel_content += "\n\n  🧠 " + " · ".join([
+                    f"[dim]{m['content']}[/dim] (t{m['origin_turn']})"
+                    for m in result["active_memories"]
+                ])
+
+            console.print(Panel(
+                panel_content,
+                title="[bold blue]Assistant[/bold blue]",
+                subtitle=f"[dim]{meta_line}[/dim]",
+                box=box.ROUNDED,
+                padding=(0, 1),
+            ))
+    except (EOFError, KeyboardInterrupt):
+        # Ctrl-D / Ctrl-C end the session, including mid-reply
+        console.print("\n[dim]Goodbye.[/dim]")
+
+
+def _quit(console: Console, agent: LongMemAgent) -> bool:
+    """Stop the CLI loop."""
+    console.print("[dim]Goodbye.[/dim]")
+    return False
+
+
+def _save_snapshot(console: Console, agent: LongMemAgent):
+    """Write a memory snapshot for the current turn."""
+    agent.store.write_snapshot(agent.turn_id)
+    console.print(f"[dim]Snapshot saved to snapshots/turn_{agent.turn_id:05d}.md[/dim]")
 
 
 def _distill_memories(console: Console, agent: LongMemAgent):
@@ -149,6 +154,9 @@ def _distill_memories(console: Console, agent: LongMemAgent):
 
 def _show_memories(console: Console, agent: LongMemAgent):
     """Display all active memories in a table."""
+    from rich.table import Table
+    from rich import box
+    
     memories = agent.get_all_memories()
     
     if not memories:
@@ -182,5 +190,14 @@ def _show_memories(console: Console, agent: LongMemAgent):
             console.print(f"  {k}: {v}")
 
 
+# Slash commands; a handler returning False ends the session
+_COMMANDS = {
+    "/quit": _quit,
+    "/memories": _show_memories,
+    "/distill": _distill_memories,
+    "/snapshot": _save_snapshot,
+}
+
+
 if __name__ == "__main__":
     main()
@@ -22,32 +22,33 @@ def migrate_database(db_path: str):
     cursor = conn.cursor()
     
     # Check if column already exists
-    cursor.execute("PRAGMA table_info(memories)")
-    columns = [row[1] for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT 1 FROM pragma_table_info('memories') WHERE name = 'last_used_turn'"
+    )
     
-    if "last_used_turn" in columns:
+    if cursor.fetchone() is not None:
         print("✓ Column 'last_used_turn' already exists - skipping migration")
         conn.close()
         return True
     
-    # Add the column
+    # Add the column and verify in one transaction
     try:
+        cursor.execute("BEGIN")
         cursor.execute("""
             ALTER TABLE memories 
             ADD COLUMN last_used_turn INTEGER DEFAULT 0
         """)
-        conn.commit()
-        print("✓ Added column 'last_used_turn' to memories table")
-        
-        # Verify
         cursor.execute("SELECT COUNT(*) FROM memories")
         count = cursor.fetchone()[0]
+        conn.commit()
+        print("✓ Added column 'last_used_turn' to memories table")
         print(f"✓ Verified: {count} existing memories now have last_used_turn=0")
         
         conn.close()
         return True
         
     except sqlite3.Error as e:
+        conn.rollback()
         print(f"❌ Migration failed: {e}")
         conn.close()
         return False
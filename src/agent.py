@@ -2,10 +2,11 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
 import time
-from typing import Any
-from groq import Groq
-import openai
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
 
 from .models import Memory, DistilledMemory
 from .store import MemoryStore
@@ -15,6 +16,15 @@ from .retriever import MemoryRetriever
 from .consolidator import MemoryConsolidator
 from .prompts import SYSTEM_PROMPT_TEMPLATE, PROFILE_SECTION, MEMORIES_SECTION
 
+if TYPE_CHECKING:
+    import httpx
+
+# Templates split around their per-turn placeholder once, at import, so
+# prompt assembly is plain concatenation instead of re-parsing .format()
+_PROMPT_HEAD, _, _PROMPT_TAIL = SYSTEM_PROMPT_TEMPLATE.partition("{memories_section}")
+_PROMPT_TAIL = _PROMPT_TAIL.format()
+_MEMORIES_HEAD, _, _MEMORIES_TAIL = MEMORIES_SECTION.partition("{memories_list}")
+
 
 class LongMemAgent:
     """
@@ -25,7 +35,7 @@ class LongMemAgent:
     2. If yes: distill memories from current segment, reset context
     3. Retrieve relevant memories for the incoming query
     4. Build system prompt with profile + retrieved memories
-    5. Run LLM inference via Groq
+    5. Run LLM inference via Groq (SQLite bookkeeping overlaps the request)
     6. Return response with metadata
     """
 
@@ -39,12 +49,32 @@ class LongMemAgent:
         context_limit: int = 8192,
         flush_threshold: float = 0.70,
         verbose: bool = False,
+        timeout: float | None = None,
+        max_retries: int | None = None,
+        max_output_tokens: int = 1024,
+        http_client: httpx.Client | None = None,
+        response_cache: dict[str, str] | None = None,
+        journal_mode: str | None = MemoryStore.JOURNAL_MODE,
+        synchronous: str | None = MemoryStore.SYNCHRONOUS,
+        mmap_size: int | None = MemoryStore.MMAP_SIZE,
     ):
-        # Initialize LLM client
+        # Initialize LLM client (timeout/retries fall back to the SDK defaults;
+        # http_client lets callers share one connection pool across agents)
         self.provider = provider
+        client_opts: dict[str, Any] = {}
+        if http_client is not None:
+            client_opts["http_client"] = http_client
+        if timeout is not None:
+            client_opts["timeout"] = timeout
+        if max_retries is not None:
+            client_opts["max_retries"] = max_retries
+        # SDKs are imported lazily so only the chosen provider pays the cost
         if provider == "groq" and not base_url:
-            self.client = Groq(api_key=api_key)
+            from groq import Groq
+            self.client = Groq(api_key=api_key, **client_opts)
         else:
+            import openai
+
             # Normalize defaults for Ollama
             if provider == "ollama" and not base_url:
                 base_url = "http://localhost:11434/v1"
@@ -62,13 +92,22 @@ class LongMemAgent:
             if base_url and not api_key:
                 api_key = "dummy"
                 
-            self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
+            self.client = openai.OpenAI(api_key=api_key, base_url=base_url, **client_opts)
 
         self.model = model
+        self.max_output_tokens = max_output_tokens
         self.verbose = verbose
+        # Single worker for LLM calls so SQLite bookkeeping can overlap them
+        self._llm_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm")
+
+        # Optional reply cache for chat(..., cacheable=True), keyed by
+        # (retrieved memory ids, message); the caller owns and may share it
+        self.response_cache = response_cache
 
         # Components
-        self.store = MemoryStore(db_path)
+        self.store = MemoryStore(
+            db_path, journal_mode=journal_mode, synchronous=synchronous, mmap_size=mmap_size,
+        )
         self.distiller = MemoryDistiller(self.client, model=model, provider=provider, verbose=verbose)
         self.retriever = MemoryRetriever(self.store)
         self.consolidator = MemoryConsolidator(self.store, client=self.client, model=model, provider=provider)
@@ -83,92 +122,131 @@ class LongMemAgent:
         self.segment_start_turn: int = max(1, self.turn_id + 1)
         self.total_flushes: int = 0
 
-        # Initialize system prompt
+        # Initialize system prompt (frame cached until the profile changes)
+        self._frame: tuple[str, str, frozenset[str]] | None = None
+        self._frame_version = -1
         self._rebuild_system_prompt()
 
-    def chat(self, user_message: str) -> dict:
+    def chat(self, user_message: str, cacheable: bool = False) -> dict:
         """
         Process a user message and return the assistant response with metadata.
         
+        With cacheable=True and a response_cache, a reply already produced for
+        the same message and retrieved memories is reused instead of calling
+        the LLM; context, memory touches and turn logging still happen.
+        
         Returns dict with keys:
             response: str
             turn_id: int
-            context_utilization: str
+            context_utilization: float (0..1)
+            context_utilization_str: str
             active_memories: list[dict]
             flush_triggered: bool
             total_memories: int
+            rate_limit_headers: dict[str, str]
+            cached: bool
         """
         self.turn_id += 1
         flush_triggered = False
-        retrieval_ms = 0.0
-        total_start = time.time()
+        total_start = time.perf_counter_ns()
 
         # ── STEP 1: Check if context needs flushing ──
-        incoming_estimate = self.ctx.count_tokens(user_message) + 300  # response estimate
+        user_tokens = self.ctx.count_tokens(user_message)
+        incoming_estimate = user_tokens + 300  # response estimate
         if self.ctx.needs_flush(incoming_estimate) and self.ctx.message_count() > 0:
             self._flush()
             flush_triggered = True
 
         # ── STEP 2: Retrieve relevant memories ──
-        retrieval_start = time.time()
+        retrieval_start = time.perf_counter_ns()
         results = self.retriever.retrieve(user_message, top_k=5, current_turn=self.turn_id)
+        retrieval_ns = time.perf_counter_ns() - retrieval_start
         retrieved_memories = [r.memory for r in results]
-        retrieval_ms = (time.time() - retrieval_start) * 1000
+        memory_ids = [m.id for m in retrieved_memories]
         
-        # Update last_used_turn for retrieved memories
-        for memory in retrieved_memories:
-            self.store.touch_memory(memory.id, self.turn_id)
-
         # ── STEP 3: Rebuild system prompt with retrieved memories ──
         self._rebuild_system_prompt(query_memories=retrieved_memories)
 
         # ── STEP 4: Add user message to context ──
-        self.ctx.add_message("user", user_message)
-
-        # ── STEP 5: LLM inference ──
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=self.ctx.get_messages_for_api(provider=self.provider),
-            temperature=0.7,
-            max_tokens=1024,
-        )
-        assistant_msg = response.choices[0].message.content
-
-        # ── STEP 6: Add assistant response to context ──
+        self.ctx.add_message("user", user_message, tokens=user_tokens)
+
+        # ── STEP 5: Start LLM inference (or use a cached reply) ──
+        cache_key = None
+        assistant_msg = None
+        rate_limit_headers: dict[str, str] = {}
+        if cacheable and self.response_cache is not None:
+            fingerprint = json.dumps([memory_ids, user_message])
+            cache_key = hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest()
+            assistant_msg = self.response_cache.get(cache_key)
+        cached = assistant_msg is not None
+
+        pending = None
+        if not cached:
+            pending = self._llm_pool.submit(
+                self._complete, self.ctx.get_messages_for_api(provider=self.provider)
+            )
+
+        # ── STEP 6: SQLite bookkeeping while the request is in flight ──
+        # (stays on this thread; the savepoint keeps the touch + log only if
+        # the request succeeds, so a failed and retried turn is logged once)
+        with self.store.savepoint():
+            self.store.touch_memories(memory_ids, self.turn_id)
+            self.store.log_turn(
+                self.turn_id, "user", user_message,
+                memories_retrieved=memory_ids,
+            )
+            total_memories = self.store.active_count()
+
+            # ── STEP 7: Collect the response and add it to context ──
+            if pending is not None:
+                assistant_msg, rate_limit_headers = pending.result()
+        if cache_key is not None and not cached:
+            self.response_cache[cache_key] = assistant_msg
         self.ctx.add_message("assistant", assistant_msg)
 
-        # ── STEP 7: Log turn ──
-        self.store.log_turn(
-            self.turn_id, "user", user_message,
-            memories_retrieved=[m.id for m in retrieved_memories],
-        )
-
-        total_ms = (time.time() - total_start) * 1000
+        total_ns = time.perf_counter_ns() - total_start
 
         # ── STEP 8: Return with metadata ──
+        utilization = self.ctx.utilization()
+        turn_id = self.turn_id
         return {
             "response": assistant_msg,
-            "turn_id": self.turn_id,
-            "context_utilization": f"{self.ctx.utilization():.0%}",
+            "turn_id": turn_id,
+            "context_utilization": utilization,
+            "context_utilization_str": f"{utilization:.0%}",
             "context_tokens": self.ctx.total_tokens(),
-            "retrieval_ms": round(retrieval_ms, 1),
-            "total_ms": round(total_ms, 1),
+            "retrieval_ms": retrieval_ns / 1e6,
+            "total_ms": total_ns / 1e6,
             "flush_triggered": flush_triggered,
             "total_flushes": self.total_flushes,
+            "rate_limit_headers": rate_limit_headers,
+            "cached": cached,
             "active_memories": [
                 {
-                    "memory_id": m.id,
+                    "memory_id": mem_id,
                     "content": f"{m.key}: {m.value}",
                     "origin_turn": m.source_turn,
-                    "last_used_turn": self.turn_id,
+                    "last_used_turn": turn_id,
                     "type": m.type,
                     "confidence": m.confidence,
                 }
-                for m in retrieved_memories
+                for mem_id, m in zip(memory_ids, retrieved_memories)
             ],
-            "total_memories": self.store.active_count(),
+            "total_memories": total_memories,
         }
 
+    def _complete(self, messages: list[dict]) -> tuple[str, dict[str, str]]:
+        """Run one chat completion; returns (reply, x-ratelimit-* headers)."""
+        raw = self.client.chat.completions.with_raw_response.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=self.max_output_tokens,
+        )
+        response = raw.parse()
+        headers = {k: v for k, v in raw.headers.items() if k.startswith("x-ratelimit-")}
+        return response.choices[0].message.content, headers
+
     def manual_distill(self) -> dict:
         """
         Manually trigger memory distillation without waiting for context threshold.
@@ -226,79 +304,116 @@ class LongMemAgent:
                       f"decayed={report.memories_decayed}, expired={report.memories_expired}")
 
     def _apply_distilled(self, distilled: list[DistilledMemory]):
-        """Apply distilled memory operations to the store."""
-        if self.verbose:
+        """Apply distilled memory operations to the store.
+
+        Operations are resolved in order against an in-memory view of the
+        active values, then written as grouped statements in one transaction:
+        one UPDATE for replaced keys, one batched insert, and a deactivation
+        for any insert that a later operation in the same batch superseded.
+        """
+        verbose = self.verbose
+        if verbose:
             print(f"\n[AGENT] Applying {len(distilled)} memory operations")
-        
+
+        add_keys = list({dm.key for dm in distilled if dm.action == "add"})
+        current = {k: m.value for k, m in self.store.find_by_keys(add_keys).items()}
+        stale_keys: set[str] = set()        # keys whose stored memories get deactivated
+        inserts: list[DistilledMemory] = []
+        pending: dict[str, int] = {}        # key -> index of its live insert
+        superseded: list[int] = []          # inserts deactivated later in the batch
+
+        def retire(key: str):
+            if key in pending:
+                superseded.append(pending.pop(key))
+            else:
+                stale_keys.add(key)
+            current.pop(key, None)
+
+        def insert(dm: DistilledMemory):
+            pending[dm.key] = len(inserts)
+            inserts.append(dm)
+            current[dm.key] = dm.value
+
         for dm in distilled:
-            if dm.action == "add":
-                # Dedup: if key already exists with same value, skip
-                existing = self.store.find_by_key(dm.key)
-                if existing:
-                    if existing.value.strip().lower() == dm.value.strip().lower():
-                        if self.verbose:
-                            print(f"  SKIP (duplicate) | {dm.key}")
-                        continue  # exact duplicate — skip
-                    else:
+            match dm.action:
+                case "add":
+                    # Dedup: if key already exists with same value, skip
+                    existing = current.get(dm.key)
+                    if existing is not None:
+                        if existing.strip().lower() == dm.value.strip().lower():
+                            if verbose:
+                                print(f"  SKIP (duplicate) | {dm.key}")
+                            continue  # exact duplicate — skip
                         # Key exists but value changed — treat as update
-                        if self.verbose:
-                            print(f"  AUTO-UPDATE | {dm.key}: {existing.value[:40]}... → {dm.value[:40]}...")
-                        self.store.deactivate_by_key(dm.key)
-                else:
-                    if self.verbose:
+                        if verbose:
+                            print(f"  AUTO-UPDATE | {dm.key}: {existing[:40]}... → {dm.value[:40]}...")
+                        retire(dm.key)
+                    elif verbose:
                         print(f"  ADD | {dm.type:12} | {dm.key}: {dm.value[:50]}...")
-                self.store.add_memory(dm, self.turn_id)
-            
-            elif dm.action == "update":
-                if self.verbose:
-                    print(f"  UPDATE | {dm.key}")
-                self.store.deactivate_by_key(dm.key)
-                self.store.add_memory(dm, self.turn_id)
-            
-            elif dm.action == "expire":
-                if self.verbose:
-                    print(f"  EXPIRE | {dm.key}")
-                self.store.deactivate_by_key(dm.key)
-            
-            # "keep" → no-op
-            elif dm.action == "keep" and self.verbose:
-                print(f"  KEEP | {dm.key}")
+                    insert(dm)
+
+                case "update":
+                    if verbose:
+                        print(f"  UPDATE | {dm.key}")
+                    retire(dm.key)
+                    insert(dm)
+
+                case "expire":
+                    if verbose:
+                        print(f"  EXPIRE | {dm.key}")
+                    retire(dm.key)
+
+                case "keep":  # no-op
+                    if verbose:
+                        print(f"  KEEP | {dm.key}")
+
+        with self.store.batch():
+            self.store.deactivate_by_keys(list(stale_keys))
+            mem_ids = self.store.add_memories(inserts, self.turn_id)
+            self.store.deactivate_by_ids([mem_ids[i] for i in superseded])
 
     def _rebuild_system_prompt(self, query_memories: list[Memory] | None = None):
         """Construct system prompt from profile + optional retrieved memories."""
-        profile = self.store.get_profile()
-
-        # Profile section
-        if profile:
-            profile_yaml = "\n".join(f"- {k}: {v}" for k, v in profile.items())
-            profile_section = PROFILE_SECTION.format(profile_yaml=profile_yaml)
-        else:
-            profile_section = ""
+        prefix, suffix, profile_keys = self._prompt_frame()
 
         # Memories section
+        memories_section = ""
         if query_memories:
-            profile_keys = set(profile.keys()) if profile else set()
-            mem_lines = []
-            for m in query_memories:
-                # Deduplicate: don't show here if already in profile section
-                if m.key not in profile_keys:
-                    mem_lines.append(f"- [{m.type}] {m.key}: {m.value}")
-            
+            # Deduplicate: don't show here if already in profile section
+            mem_lines = [
+                f"- [{m.type}] {m.key}: {m.value}"
+                for m in query_memories
+                if m.key not in profile_keys
+            ]
             if mem_lines:
-                memories_section = MEMORIES_SECTION.format(
-                    memories_list="\n".join(mem_lines)
-                )
-            else:
-                memories_section = ""
-        else:
-            memories_section = ""
+                memories_section = _MEMORIES_HEAD + "\n".join(mem_lines) + _MEMORIES_TAIL
 
-        prompt = SYSTEM_PROMPT_TEMPLATE.format(
-            profile_section=profile_section,
-            memories_section=memories_section,
-        )
+        self.ctx.set_system_prompt(prefix + memories_section + suffix)
+
+    def _prompt_frame(self) -> tuple[str, str, frozenset[str]]:
+        """Prompt text before/after the memories section, plus the profile keys.
 
-        self.ctx.set_system_prompt(prompt)
+        Only the memories section changes per turn, so the profile-dependent
+        frame is re-rendered only when the store's profile_version moves.
+        """
+        version = self.store.profile_version
+        if self._frame is None or self._frame_version != version:
+            profile = self.store.get_profile()
+
+            # Profile section
+            if profile:
+                profile_yaml = "\n".join(f"- {k}: {v}" for k, v in profile.items())
+                profile_section = PROFILE_SECTION.format(profile_yaml=profile_yaml)
+            else:
+                profile_section = ""
+
+            self._frame = (
+                _PROMPT_HEAD.format(profile_section=profile_section),
+                _PROMPT_TAIL,
+                frozenset(profile),
+            )
+            self._frame_version = version
+        return self._frame
 
     def get_all_memories(self) -> list[dict]:
         """Return all active memories as dicts (for debugging/eval)."""
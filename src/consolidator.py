@@ -8,11 +8,15 @@ memory store lean and high-quality.
 from __future__ import annotations
 
 import logging
-import time
+import os
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import partial
 from typing import Any
 
+import numpy as np
+
 from .models import Memory
 from .store import MemoryStore
 
@@ -42,20 +46,6 @@ class ConsolidationReport:
     total_active_after: int
 
 
-# ---------------------------------------------------------------------------
-# Helpers
-# ---------------------------------------------------------------------------
-
-def _cosine_similarity(a: list[float], b: list[float]) -> float:
-    """Compute cosine similarity between two vectors."""
-    dot = sum(x * y for x, y in zip(a, b))
-    norm_a = sum(x * x for x in a) ** 0.5
-    norm_b = sum(x * x for x in b) ** 0.5
-    if norm_a == 0.0 or norm_b == 0.0:
-        return 0.0
-    return dot / (norm_a * norm_b)
-
-
 # ---------------------------------------------------------------------------
 # MemoryConsolidator
 # ---------------------------------------------------------------------------
@@ -71,6 +61,10 @@ class MemoryConsolidator:
     """
 
     SIMILARITY_THRESHOLD = 0.85
+    SIMILARITY_BLOCK = 1024  # rows per similarity matmul; bounds memory to BLOCK x N
+    # Row blocks scanned concurrently (NumPy releases the GIL); each holds a
+    # BLOCK x N float32 slab while it runs
+    SIMILARITY_WORKERS = min(4, os.cpu_count() or 1)
 
     def __init__(
         self,
@@ -102,13 +96,11 @@ class MemoryConsolidator:
         duplicates_found = len(groups)
         duplicates_merged = self.merge_duplicates(groups)
 
-        # Step 3: decay
-        memories_decayed = self.decay_stale(current_turn)
+        # Step 3 & 4: decay, then expire, in a single pass over the table
+        memories_decayed, memories_expired = self.decay_and_expire(current_turn)
 
-        # Step 4: expire
-        memories_expired = self.expire_low_confidence()
-
-        total_after = self.store.active_count()
+        # Every step reports its rowcount, so no second count is needed
+        total_after = total_before - duplicates_merged - memories_expired
 
         report = ConsolidationReport(
             duplicates_found=duplicates_found,
@@ -138,10 +130,11 @@ class MemoryConsolidator:
 
         Uses a two-pass approach for efficiency:
         1. **Key pass** -- exact key match (definite duplicates).
-        2. **Vector pass** -- for each memory, search the store's vector index
-           for semantically similar memories (similarity > threshold).
+        2. **Vector pass** -- pairwise cosine similarity of the remaining
+           memories' embeddings; memories connected through pairs at or above
+           the threshold form one group.
         """
-        active = self.store.get_active_memories()
+        active = list(self.store.iter_active_memories())
         if len(active) < 2:
             return []
 
@@ -174,41 +167,66 @@ class MemoryConsolidator:
             )
 
         # --- Pass 2: vector similarity ---
-        for mem in active:
-            if mem.id in grouped_ids:
-                continue
-
-            embed_text = f"{mem.key}: {mem.value}"
-            try:
-                results = self.store.search_vector(embed_text, top_k=10)
-            except Exception:
-                logger.debug("Vector search failed for %s; skipping", mem.id)
-                continue
-
-            similar: list[Memory] = []
-            similarities: list[float] = []
-
-            for hit_id, distance in results:
-                if hit_id == mem.id or hit_id in grouped_ids:
-                    continue
-                hit_mem = self.store.get_memory_by_id(hit_id)
-                if hit_mem is None:
-                    continue
-
-                embed_a = self.store.embed(embed_text)
-                embed_b = self.store.embed(f"{hit_mem.key}: {hit_mem.value}")
-                sim = _cosine_similarity(embed_a, embed_b)
-
-                if sim >= self.SIMILARITY_THRESHOLD:
-                    similar.append(hit_mem)
-                    similarities.append(sim)
-
-            if not similar:
+        # Cosine similarity between every pair of ungrouped memories, from
+        # blocked matrix products over L2-normalised embeddings
+        rest = [m for m in active if m.id not in grouped_ids]
+        if len(rest) < 2:
+            return groups
+        # Stream the stored vectors straight into a preallocated matrix
+        pos = {m.id: i for i, m in enumerate(rest)}
+        emb = np.empty((len(rest), self.store.EMBEDDING_DIM), dtype=np.float32)
+        for mem_id, vec in self.store.iter_active_embeddings():
+            i = pos.pop(mem_id, None)
+            if i is not None:
+                emb[i] = vec
+        if pos:
+            raise KeyError(f"no stored embedding for {sorted(pos)}")
+        norms = np.linalg.norm(emb, axis=1, keepdims=True)
+        emb /= np.where(norms == 0.0, 1.0, norms)
+
+        # Threshold the row blocks, several at once when there is more than one
+        starts = range(0, len(rest), self.SIMILARITY_BLOCK)
+        block_pairs = partial(self._block_pairs, emb)
+        workers = min(self.SIMILARITY_WORKERS, len(starts))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                pairs = list(pool.map(block_pairs, starts))
+        else:
+            pairs = [block_pairs(start) for start in starts]
+
+        # Union every above-threshold pair (path-halving find, smallest index
+        # as root); each connected component becomes one group, so transitive
+        # duplicates (A~B, B~C) cluster even when A and C fall below threshold
+        parent = list(range(len(rest)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        edges: list[tuple[int, float]] = []  # (one endpoint, similarity)
+        for rows, cols, sims in pairs:
+            for i, j, sim in zip(rows.tolist(), cols.tolist(), sims.tolist()):
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+                edges.append((i, sim))
+
+        members: dict[int, list[int]] = defaultdict(list)
+        for i in range(len(rest)):
+            members[find(i)].append(i)
+        sim_totals: dict[int, list[float]] = defaultdict(list)
+        for i, sim in edges:
+            sim_totals[find(i)].append(sim)
+
+        for root, idx in members.items():
+            if len(idx) < 2:
                 continue
+            avg_sim = sum(sim_totals[root]) / len(sim_totals[root])
 
-            all_mems = [mem] + similar
+            all_mems = [rest[i] for i in idx]
             canonical, duplicates = self._pick_canonical(all_mems)
-            avg_sim = sum(similarities) / len(similarities)
             groups.append(
                 DuplicateGroup(
                     canonical=canonical,
@@ -216,8 +234,6 @@ class MemoryConsolidator:
                     similarity=avg_sim,
                 )
             )
-            for m in all_mems:
-                grouped_ids.add(m.id)
             logger.debug(
                 "Vector-match group: canonical=%s (key=%s), %d duplicates, avg_sim=%.3f",
                 canonical.id,
@@ -228,6 +244,20 @@ class MemoryConsolidator:
 
         return groups
 
+    def _block_pairs(
+        self, emb: np.ndarray, start: int
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Pairs ``i < j`` at or above the threshold with ``i`` in the row block at *start*.
+
+        Only columns from *start* on are multiplied: pairs with an earlier
+        column were found by an earlier block.
+        """
+        block = emb[start:start + self.SIMILARITY_BLOCK] @ emb[start:].T
+        rows, cols = np.nonzero(block >= self.SIMILARITY_THRESHOLD)
+        upper = cols > rows  # each pair once, no self-pairs
+        rows, cols = rows[upper], cols[upper]
+        return rows + start, cols + start, block[rows, cols]
+
     # ------------------------------------------------------------------
     # Duplicate merging
     # ------------------------------------------------------------------
@@ -236,12 +266,12 @@ class MemoryConsolidator:
         """Deactivate the duplicate memories in each group.
 
         The canonical memory is kept.  Returns the total number of memories
-        deactivated across all groups.
+        deactivated across all groups (already-inactive ones don't count).
         """
-        total_merged = 0
+        dup_ids: list[str] = []
         for group in groups:
             for dup in group.duplicates:
-                self._deactivate_memory(dup)
+                dup_ids.append(dup.id)
                 logger.debug(
                     "Deactivated duplicate %s (key=%s, value=%s) "
                     "in favour of canonical %s",
@@ -250,8 +280,7 @@ class MemoryConsolidator:
                     dup.value,
                     group.canonical.id,
                 )
-                total_merged += 1
-        return total_merged
+        return self._deactivate_many(dup_ids)
 
     # ------------------------------------------------------------------
     # Staleness decay
@@ -272,35 +301,13 @@ class MemoryConsolidator:
 
         Returns the number of memories whose confidence was reduced.
         """
-        active = self.store.get_active_memories()
-        decayed = 0
-
-        for mem in active:
-            if mem.last_used_turn <= 0:
-                continue
-            turns_since_use = current_turn - mem.last_used_turn
-            if turns_since_use <= decay_threshold:
-                continue
-
-            new_conf = round(mem.confidence * decay_factor, 6)
-            self.store.db.execute(
-                "UPDATE memories SET confidence = ?, updated_at = ? WHERE id = ?",
-                (new_conf, time.time(), mem.id),
-            )
-            logger.debug(
-                "Decayed memory %s (key=%s): %.3f -> %.3f "
-                "(last used turn %d, current turn %d)",
-                mem.id,
-                mem.key,
-                mem.confidence,
-                new_conf,
-                mem.last_used_turn,
-                current_turn,
-            )
-            decayed += 1
-
-        if decayed:
-            self.store.db.commit()
+        # One UPDATE inside SQLite instead of a Python loop over every memory
+        decayed = self.store.decay_stale(current_turn - decay_threshold, decay_factor)
+        logger.debug(
+            "Decayed %d memories unused since before turn %d",
+            decayed,
+            current_turn - decay_threshold,
+        )
         return decayed
 
     # ------------------------------------------------------------------
@@ -312,23 +319,36 @@ class MemoryConsolidator:
 
         Returns the number of memories expired.
         """
-        active = self.store.get_active_memories()
-        expired = 0
+        expired = self.store.deactivate_below_confidence(min_confidence)
+        logger.debug(
+            "Expired %d memories with confidence < %.3f", expired, min_confidence
+        )
+        return expired
 
-        for mem in active:
-            if mem.confidence >= min_confidence:
-                continue
-            self._deactivate_memory(mem)
-            logger.debug(
-                "Expired memory %s (key=%s, confidence=%.3f < %.3f)",
-                mem.id,
-                mem.key,
-                mem.confidence,
-                min_confidence,
-            )
-            expired += 1
+    def decay_and_expire(
+        self,
+        current_turn: int,
+        decay_threshold: int = 200,
+        decay_factor: float = 0.9,
+        min_confidence: float = 0.3,
+    ) -> tuple[int, int]:
+        """Run :meth:`decay_stale` and :meth:`expire_low_confidence` as one UPDATE.
 
-        return expired
+        Returns ``(decayed, expired)``, the same counts the two steps would
+        report when run back to back.
+        """
+        decayed, expired = self.store.decay_and_expire(
+            current_turn - decay_threshold, decay_factor, min_confidence
+        )
+        logger.debug(
+            "Decayed %d memories unused since before turn %d; "
+            "expired %d with confidence < %.3f",
+            decayed,
+            current_turn - decay_threshold,
+            expired,
+            min_confidence,
+        )
+        return decayed, expired
 
     # ------------------------------------------------------------------
     # Internal helpers
@@ -343,21 +363,14 @@ class MemoryConsolidator:
         Selection criteria (in order):
         1. Highest confidence.
         2. Most recently updated (``updated_at``).
-        3. Arbitrary (first in sorted order).
+        3. First in input order.
+
+        Duplicates keep their input order.
         """
-        ranked = sorted(
-            memories,
-            key=lambda m: (m.confidence, m.updated_at),
-            reverse=True,
-        )
-        canonical = ranked[0]
-        duplicates = ranked[1:]
+        canonical = max(memories, key=lambda m: (m.confidence, m.updated_at))
+        duplicates = [m for m in memories if m is not canonical]
         return canonical, duplicates
 
-    def _deactivate_memory(self, mem: Memory) -> None:
-        """Deactivate a single memory by ID via direct SQL."""
-        self.store.db.execute(
-            "UPDATE memories SET is_active = 0, updated_at = ? WHERE id = ?",
-            (time.time(), mem.id),
-        )
-        self.store.db.commit()
+    def _deactivate_many(self, mem_ids: list[str]) -> int:
+        """Deactivate several memories by ID and commit; returns how many were active."""
+        return self.store.deactivate_by_ids(mem_ids)
@@ -14,6 +14,15 @@ class ContextManager:
     keeping only the last few turns for continuity.
     """
 
+    # While utilization is below ESTIMATE_BELOW, add_message() prices ASCII
+    # messages at CHARS_PER_TOKEN characters per token instead of running the
+    # tokenizer; needs_flush() and reset() swap in exact counts.  cl100k packs
+    # ASCII prose at ~4 and code at ~3 characters per token, so the estimate
+    # over-counts and the flush never fires late.  Non-ASCII text (Kannada,
+    # Devanagari: a token per character or worse) is always counted exactly.
+    ESTIMATE_BELOW = 0.6
+    CHARS_PER_TOKEN = 2
+
     def __init__(
         self,
         model_context_limit: int = 8192,
@@ -28,6 +37,14 @@ class ContextManager:
         
         self.system_prompt: str = ""
         self.messages: list[dict[str, str]] = []
+        # Token cost (content + role overhead) of each message, parallel to
+        # self.messages so carried-over turns are never re-encoded
+        self._message_costs: list[int] = []
+        # Distiller-format line of each message, also parallel to self.messages
+        self._rendered: list[str] = []
+        # Whether each message's cost is a character-ratio estimate
+        self._estimated: list[bool] = []
+        self._estimate_count: int = 0
         self._system_tokens: int = 0
         self._message_tokens: int = 0
 
@@ -35,6 +52,10 @@ class ContextManager:
         """Count tokens in a string."""
         return len(self.encoder.encode(text))
 
+    def estimate_tokens(self, text: str) -> int:
+        """Cheap token estimate from the character count (meant for ASCII text)."""
+        return max(1, -(-len(text) // self.CHARS_PER_TOKEN))
+
     def total_tokens(self) -> int:
         """Total tokens currently in context (system + messages)."""
         return self._system_tokens + self._message_tokens
@@ -55,17 +76,51 @@ class ContextManager:
         Call this BEFORE adding the new user message.
         """
         projected = self.total_tokens() + incoming_tokens
+        if (
+            self._estimate_count
+            and projected >= self.model_context_limit * self.ESTIMATE_BELOW
+        ):
+            # Close to the threshold: decide on exact counts
+            self._settle_estimates()
+            projected = self.total_tokens() + incoming_tokens
         return projected >= (self.model_context_limit * self.flush_threshold)
 
     def set_system_prompt(self, prompt: str):
         """Set or replace the system prompt. Recalculates token count."""
+        if prompt == self.system_prompt and self._system_tokens:
+            return  # unchanged (e.g. no memories retrieved again)
         self.system_prompt = prompt
         self._system_tokens = self.count_tokens(prompt) + 4  # role overhead
 
-    def add_message(self, role: str, content: str):
-        """Append a message to the conversation history."""
+    def add_message(self, role: str, content: str, tokens: int | None = None):
+        """Append a message to the conversation history.
+
+        Pass *tokens* when the caller already counted *content*.  Otherwise
+        ASCII content is estimated while utilization is below ESTIMATE_BELOW;
+        everything else is counted exactly.
+        """
+        estimated = False
+        if tokens is None:
+            if self.utilization() < self.ESTIMATE_BELOW and content.isascii():
+                tokens = self.estimate_tokens(content)
+                estimated = True
+                self._estimate_count += 1
+            else:
+                tokens = self.count_tokens(content)
         self.messages.append({"role": role, "content": content})
-        self._message_tokens += self.count_tokens(content) + 4  # role overhead
+        self._rendered.append(self._render_line(role, content))
+        self._message_costs.append(tokens + 4)  # role overhead
+        self._estimated.append(estimated)
+        self._message_tokens += tokens + 4
+
+    def _settle_estimates(self):
+        """Replace estimated message costs with exact tokenizer counts."""
+        for i, estimated in enumerate(self._estimated):
+            if estimated:
+                self._message_costs[i] = self.count_tokens(self.messages[i]["content"]) + 4
+                self._estimated[i] = False
+        self._estimate_count = 0
+        self._message_tokens = sum(self._message_costs)
 
     def get_messages_for_api(self, provider: str = "") -> list[dict[str, str]]:
         """
@@ -105,13 +160,14 @@ class ContextManager:
         Assistant messages are truncated to reduce noise and token usage.
         Format: 'USER: ...\nASSISTANT: ...\n'
         """
-        lines = []
-        for msg in self.messages:
-            content = msg["content"]
-            if msg["role"] == "assistant" and len(content) > 500:
-                content = content[:500] + "... [truncated]"
-            lines.append(f"{msg['role'].upper()}: {content}")
-        return "\n\n".join(lines)
+        return "\n\n".join(self._rendered)
+
+    @staticmethod
+    def _render_line(role: str, content: str) -> str:
+        """One message as a get_conversation_text() line."""
+        if role == "assistant" and len(content) > 500:
+            content = content[:500] + "... [truncated]"
+        return f"{role.upper()}: {content}"
 
     def message_count(self) -> int:
         """Number of messages in current context."""
@@ -122,12 +178,12 @@ class ContextManager:
         Reset context: keep only the last N messages for continuity,
         replace system prompt, recalculate all token counts.
         """
-        carryover = self.messages[-self.keep_last_turns:] if self.messages else []
-        self.messages = carryover
-        self.system_prompt = new_system_prompt
+        self.messages = self.messages[-self.keep_last_turns:]
+        self._message_costs = self._message_costs[-self.keep_last_turns:]
+        self._rendered = self._rendered[-self.keep_last_turns:]
+        self._estimated = self._estimated[-self.keep_last_turns:]
         
-        # Recalculate tokens from scratch
-        self._system_tokens = self.count_tokens(new_system_prompt) + 4
-        self._message_tokens = sum(
-            self.count_tokens(m["content"]) + 4 for m in self.messages
-        )
+        # Carried-over messages keep their counted cost (estimates are made
+        # exact here); only the prompt is new
+        self.set_system_prompt(new_system_prompt)
+        self._settle_estimates()
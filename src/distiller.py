@@ -10,11 +10,17 @@ from __future__ import annotations
 import json
 import logging
 import re
+import sys
 from typing import Any
 
 from .models import Memory, DistilledMemory
 from .prompts import EXTRACTION_PROMPT, VALIDATION_PROMPT
 
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib json module is the fallback
+    orjson = None
+
 logger = logging.getLogger("atlas.distiller")
 
 # Valid memory types (anything else gets rejected)
@@ -26,6 +32,36 @@ VALID_TYPES = frozenset({
 # Valid actions
 VALID_ACTIONS = frozenset({"add", "update", "keep", "expire"})
 
+# Actions on existing memories; these skip pass-2 validation
+PASSTHROUGH_ACTIONS = frozenset({"keep", "expire"})
+
+# Markdown code fences around a JSON reply
+_FENCE_OPEN = re.compile(r"^```(?:json)?\s*")
+_FENCE_CLOSE = re.compile(r"\s*```$")
+
+# Truncated-reply cleanup for _recover_truncated_json()
+_DANGLING_KEY = re.compile(r',\s*"[^"]*$')
+_DANGLING_COMMA = re.compile(r',\s*$')
+_TRAILING_ELLIPSIS = re.compile(r'\.{2,}$')
+_MEMORIES_ARRAY = re.compile(r'"memories"\s*:\s*\[')
+
+_DECODER = json.JSONDecoder()
+
+
+def _loads(text: str) -> Any:
+    """Parse JSON via orjson when installed.
+
+    Replies orjson refuses but stdlib json accepts (NaN literals, lone
+    surrogates) are retried with json.loads, so parsing is never stricter.
+    Raises json.JSONDecodeError like json.loads.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
 
 class MemoryDistiller:
     """
@@ -41,6 +77,9 @@ class MemoryDistiller:
         self.model = model
         self.provider = provider
         self.verbose = verbose
+        # Prompt line per existing memory from the last distill() call, keyed
+        # by the fields it shows; most memories carry over between flushes
+        self._mem_lines: dict[tuple, str] = {}
 
     def distill(
         self,
@@ -59,14 +98,21 @@ class MemoryDistiller:
         if not conversation_text.strip():
             return []
 
-        # Format existing memories
+        # Format existing memories, reusing lines from the previous call
         if existing_memories:
+            previous, current = self._mem_lines, {}
             mem_lines = []
             for m in existing_memories:
-                mem_lines.append(
-                    f"- [{m.type}] {m.key}: {m.value} "
-                    f"(confidence: {m.confidence:.2f}, from turn {m.source_turn})"
-                )
+                sig = (m.type, m.key, m.value, m.confidence, m.source_turn)
+                line = previous.get(sig)
+                if line is None:
+                    line = (
+                        f"- [{m.type}] {m.key}: {m.value} "
+                        f"(confidence: {m.confidence:.2f}, from turn {m.source_turn})"
+                    )
+                current[sig] = line
+                mem_lines.append(line)
+            self._mem_lines = current
             existing_text = "\n".join(mem_lines)
         else:
             existing_text = "(none yet — this is the start of the conversation)"
@@ -122,23 +168,7 @@ class MemoryDistiller:
         if self.verbose:
             print(f"\n[DISTILLER] Pass 1: Extracting from turns {start_turn}-{end_turn}")
 
-        kwargs = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.1,
-            "max_tokens": 4000,
-        }
-
-        if self.provider in ("groq", "gemini"):
-            kwargs["response_format"] = {"type": "json_object"}
-
-        response = self.client.chat.completions.create(**kwargs)
-        raw = response.choices[0].message.content
-
-        if self.verbose and hasattr(response, 'usage') and response.usage:
-            print(f"  Pass 1 tokens: prompt={response.usage.prompt_tokens}, "
-                  f"completion={response.usage.completion_tokens}")
-
+        raw = self._complete(prompt, max_tokens=4000, label="Pass 1")
         return self._parse_response(raw)
 
     def _validate_candidates(
@@ -148,8 +178,10 @@ class MemoryDistiller:
     ) -> list[DistilledMemory]:
         """Pass 2: Strict validation of candidate memories."""
         # Keep/expire actions on existing memories bypass validation
-        keep_expire = [dm for dm in candidates if dm.action in ("keep", "expire")]
-        to_validate = [dm for dm in candidates if dm.action not in ("keep", "expire")]
+        keep_expire: list[DistilledMemory] = []
+        to_validate: list[DistilledMemory] = []
+        for dm in candidates:
+            (keep_expire if dm.action in PASSTHROUGH_ACTIONS else to_validate).append(dm)
 
         if not to_validate:
             logger.debug("No candidates to validate (all keep/expire)")
@@ -176,22 +208,7 @@ class MemoryDistiller:
         if self.verbose:
             print(f"  Pass 2: Validating {len(to_validate)} candidates")
 
-        kwargs = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.1,
-            "max_tokens": 2000,
-        }
-
-        if self.provider in ("groq", "gemini"):
-            kwargs["response_format"] = {"type": "json_object"}
-
-        response = self.client.chat.completions.create(**kwargs)
-        raw = response.choices[0].message.content
-
-        if self.verbose and hasattr(response, 'usage') and response.usage:
-            print(f"  Pass 2 tokens: prompt={response.usage.prompt_tokens}, "
-                  f"completion={response.usage.completion_tokens}")
+        raw = self._complete(prompt, max_tokens=2000, label="Pass 2")
 
         # Parse validation results
         verdicts = self._parse_validation(raw)
@@ -216,17 +233,52 @@ class MemoryDistiller:
 
         return keep_expire + validated
 
-    def _parse_validation(self, raw: str) -> list[dict]:
-        """Parse the validation response JSON."""
+    def _complete(self, prompt: str, max_tokens: int, label: str) -> str:
+        """One JSON-mode completion for *prompt*; returns the raw reply text."""
+        kwargs = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.1,
+            "max_tokens": max_tokens,
+        }
+
+        if self._json_mode:
+            kwargs["response_format"] = {"type": "json_object"}
+
+        response = self.client.chat.completions.create(**kwargs)
+
+        if self.verbose and hasattr(response, 'usage') and response.usage:
+            print(f"  {label} tokens: prompt={response.usage.prompt_tokens}, "
+                  f"completion={response.usage.completion_tokens}")
+
+        return response.choices[0].message.content
+
+    @property
+    def _json_mode(self) -> bool:
+        """Whether the provider is asked for a bare JSON object reply."""
+        return self.provider in ("groq", "gemini")
+
+    def _load_reply(self, raw: str) -> dict | None:
+        """Strip code fences and parse a reply, falling back to truncation recovery."""
+        if self._json_mode:
+            # Replies are bare JSON in this mode; only clean up if that fails
+            try:
+                return _loads(raw)
+            except json.JSONDecodeError:
+                pass
+
         cleaned = raw.strip()
-        cleaned = re.sub(r"^```(?:json)?\s*", "", cleaned)
-        cleaned = re.sub(r"\s*```$", "", cleaned)
+        cleaned = _FENCE_OPEN.sub("", cleaned)
+        cleaned = _FENCE_CLOSE.sub("", cleaned)
 
         try:
-            data = json.loads(cleaned)
+            return _loads(cleaned)
         except json.JSONDecodeError:
-            data = self._recover_truncated_json(cleaned)
+            return self._recover_truncated_json(cleaned)
 
+    def _parse_validation(self, raw: str) -> list[dict]:
+        """Parse the validation response JSON."""
+        data = self._load_reply(raw)
         if data is None:
             logger.warning("Failed to parse validation response")
             return []
@@ -235,16 +287,7 @@ class MemoryDistiller:
 
     def _parse_response(self, raw: str) -> list[DistilledMemory]:
         """Parse LLM JSON response into DistilledMemory objects."""
-        cleaned = raw.strip()
-        cleaned = re.sub(r"^```(?:json)?\s*", "", cleaned)
-        cleaned = re.sub(r"\s*```$", "", cleaned)
-
-        data = None
-        try:
-            data = json.loads(cleaned)
-        except json.JSONDecodeError:
-            data = self._recover_truncated_json(cleaned)
-
+        data = self._load_reply(raw)
         if data is None:
             return []
 
@@ -253,16 +296,11 @@ class MemoryDistiller:
 
         for item in memories:
             try:
-                val = item.get("value", "")
-                if isinstance(val, (list, dict)):
-                    val = json.dumps(val)
-
                 action = item.get("action", "add")
                 mem_type = item.get("type", "fact")
                 key = item.get("key", "unknown")
-                value = str(val)
 
-                # Basic structural validation
+                # Basic structural validation, before any value conversion
                 if action not in VALID_ACTIONS:
                     logger.debug("Rejected (bad action): %s | %s", action, key)
                     continue
@@ -271,12 +309,21 @@ class MemoryDistiller:
                     logger.debug("Rejected (bad type): %s | %s", mem_type, key)
                     continue
 
-                if not key or not value or key == "unknown":
+                if not key or key == "unknown":
+                    continue
+
+                val = item.get("value", "")
+                if isinstance(val, (list, dict)):
+                    val = json.dumps(val)
+                value = str(val)
+                if not value:
                     continue
 
+                # Both are known-valid strings here; interning them lets later
+                # set/match checks on them succeed on identity
                 dm = DistilledMemory(
-                    action=action,
-                    type=mem_type,
+                    action=sys.intern(action),
+                    type=sys.intern(mem_type),
                     category=item.get("category", "general"),
                     key=key,
                     value=value,
@@ -294,9 +341,9 @@ class MemoryDistiller:
     def _recover_truncated_json(self, text: str) -> dict | None:
         """Attempt to recover valid JSON from a truncated LLM response."""
         attempt = text.rstrip()
-        attempt = re.sub(r',\s*"[^"]*$', '', attempt)
-        attempt = re.sub(r',\s*$', '', attempt)
-        attempt = re.sub(r'\.{2,}$', '', attempt)
+        attempt = _DANGLING_KEY.sub('', attempt)
+        attempt = _DANGLING_COMMA.sub('', attempt)
+        attempt = _TRAILING_ELLIPSIS.sub('', attempt)
 
         open_braces = attempt.count('{') - attempt.count('}')
         open_brackets = attempt.count('[') - attempt.count(']')
@@ -313,25 +360,42 @@ class MemoryDistiller:
 
         for s in strategies:
             try:
-                data = json.loads(s)
+                data = _loads(s)
                 logger.warning("Recovered truncated JSON via bracket-closing")
                 return data
             except json.JSONDecodeError:
                 continue
 
-        pattern = r'\{[^{}]*"action"\s*:\s*"[^"]+"[^{}]*"key"\s*:\s*"[^"]+"[^{}]*"value"\s*:\s*"[^"]+"[^{}]*\}'
-        matches = re.findall(pattern, text)
-        if matches:
-            recovered_memories = []
-            for m in matches:
-                try:
-                    obj = json.loads(m)
-                    recovered_memories.append(obj)
-                except json.JSONDecodeError:
-                    continue
-            if recovered_memories:
-                logger.warning("Recovered %d memories via regex extraction", len(recovered_memories))
-                return {"memories": recovered_memories}
+        recovered_memories = self._complete_memory_objects(text)
+        if recovered_memories:
+            logger.warning("Recovered %d memories via incremental decoding", len(recovered_memories))
+            return {"memories": recovered_memories}
 
         logger.error("Failed to parse JSON: %s...", text[:200])
         return None
+
+    @staticmethod
+    def _complete_memory_objects(text: str) -> list[dict]:
+        """Every complete memory object in a (possibly truncated) "memories" array.
+
+        Walks the array with JSONDecoder.raw_decode, one element at a time,
+        and stops at the first element that does not decode (the cut-off
+        one).  Nested values decode normally.
+        """
+        start = _MEMORIES_ARRAY.search(text)
+        if start is None:
+            return []
+        objs = []
+        i, n = start.end(), len(text)
+        while i < n:
+            while i < n and text[i] in " \t\r\n,":
+                i += 1
+            if i >= n or text[i] == "]":
+                break
+            try:
+                obj, i = _DECODER.raw_decode(text, i)
+            except json.JSONDecodeError:
+                break
+            if isinstance(obj, dict) and {"action", "key", "value"} <= obj.keys():
+                objs.append(obj)
+        return objs
@@ -32,7 +32,7 @@ STOPWORDS = frozenset({
 
 # -- Data Classes --
 
-@dataclass
+@dataclass(slots=True)
 class Memory:
     """A single memory unit stored in the database."""
     id: str
@@ -52,7 +52,7 @@ class Memory:
         return f"mem_{uuid.uuid4().hex[:8]}"
 
 
-@dataclass
+@dataclass(slots=True)
 class DistilledMemory:
     """Output from the distiller before being persisted."""
     action: str             # one of MEMORY_ACTIONS
@@ -64,7 +64,7 @@ class DistilledMemory:
     reasoning: str
 
 
-@dataclass 
+@dataclass(slots=True)
 class RetrievalResult:
     """A memory with its retrieval score."""
     memory: Memory
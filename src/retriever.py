@@ -4,7 +4,6 @@ and relevance-scored filtering."""
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass
 
 from .models import Memory, RetrievalResult
 from .store import MemoryStore
@@ -12,15 +11,6 @@ from .store import MemoryStore
 logger = logging.getLogger("atlas.retriever")
 
 
-@dataclass
-class _ScoredCandidate:
-    """Internal bookkeeping for a candidate memory during scoring."""
-    memory_id: str
-    rrf_score: float
-    vector_distance: float | None  # L2 distance from vector search, None if not in vec results
-    memory: Memory | None = None   # populated after fetch
-
-
 class MemoryRetriever:
     """
     Retrieves relevant memories for a given query using hybrid search
@@ -108,8 +98,9 @@ class MemoryRetriever:
             rrf_scores[mem_id] = rrf_scores.get(mem_id, 0.0) + 1.0 / (self.RRF_K + rank + 1)
             vec_distances[mem_id] = distance
 
+        fts_ids = self.store.rowids_to_memory_ids([rowid for rowid, _ in fts_results])
         for rank, (rowid, _fts_rank) in enumerate(fts_results):
-            mem_id = self.store.rowid_to_memory_id(rowid)
+            mem_id = fts_ids.get(rowid)
             if mem_id:
                 rrf_scores[mem_id] = rrf_scores.get(mem_id, 0.0) + 1.0 / (self.RRF_K + rank + 1)
 
@@ -117,41 +108,30 @@ class MemoryRetriever:
             logger.info("retrieve: no candidates after RRF merge")
             return []
 
-        # Build candidate objects
-        candidates: dict[str, _ScoredCandidate] = {}
-        for mem_id, rrf in rrf_scores.items():
-            candidates[mem_id] = _ScoredCandidate(
-                memory_id=mem_id,
-                rrf_score=rrf,
-                vector_distance=vec_distances.get(mem_id),
-            )
-
         # Normalize RRF scores to 0-1 range
-        max_rrf = max(c.rrf_score for c in candidates.values())
-        if max_rrf == 0:
-            max_rrf = 1.0
+        max_rrf = max(rrf_scores.values()) or 1.0
 
-        # 4. Fetch Memory objects and compute final scores
-        scored_results: list[tuple[RetrievalResult, dict]] = []
+        # 4. Fetch all candidate memories in one query and compute final scores
+        memories = self.store.get_memories_by_ids(list(rrf_scores))
+        debug = logger.isEnabledFor(logging.DEBUG)
+        use_recency = current_turn is not None and current_turn > 0
+        scored_results: list[tuple[RetrievalResult, dict | None]] = []
 
-        for cand in candidates.values():
-            memory = self.store.get_memory_by_id(cand.memory_id)
-            if memory is None or not memory.is_active:
-                logger.debug("skipping inactive/missing memory %s", cand.memory_id)
+        for mem_id, rrf in rrf_scores.items():
+            memory = memories.get(mem_id)
+            if memory is None:
+                logger.debug("skipping inactive/missing memory %s", mem_id)
                 continue
-            cand.memory = memory
 
             # a) RRF normalized
-            rrf_normalized = cand.rrf_score / max_rrf
+            rrf_normalized = rrf / max_rrf
 
             # b) Semantic similarity (from L2 distance)
-            if cand.vector_distance is not None:
-                semantic_sim = 1.0 / (1.0 + cand.vector_distance)
-            else:
-                semantic_sim = 0.0
+            distance = vec_distances.get(mem_id)
+            semantic_sim = 1.0 / (1.0 + distance) if distance is not None else 0.0
 
             # c) Recency boost
-            if current_turn is not None and current_turn > 0 and memory.last_used_turn > 0:
+            if use_recency and memory.last_used_turn > 0:
                 recency = min(1.0, memory.last_used_turn / current_turn)
             else:
                 recency = 0.0
@@ -167,17 +147,20 @@ class MemoryRetriever:
                 + self.WEIGHT_CONFIDENCE * confidence
             )
 
-            score_details = {
-                "memory_id": cand.memory_id,
-                "key": memory.key,
-                "rrf_raw": cand.rrf_score,
-                "rrf_normalized": round(rrf_normalized, 4),
-                "semantic_sim": round(semantic_sim, 4),
-                "recency": round(recency, 4),
-                "confidence": round(confidence, 4),
-                "final_score": round(final_score, 4),
-            }
-            logger.debug("candidate score: %s", score_details)
+            # Per-candidate breakdown, only built when debug logging is on
+            score_details = None
+            if debug:
+                score_details = {
+                    "memory_id": mem_id,
+                    "key": memory.key,
+                    "rrf_raw": rrf,
+                    "rrf_normalized": round(rrf_normalized, 4),
+                    "semantic_sim": round(semantic_sim, 4),
+                    "recency": round(recency, 4),
+                    "confidence": round(confidence, 4),
+                    "final_score": round(final_score, 4),
+                }
+                logger.debug("candidate score: %s", score_details)
 
             scored_results.append((
                 RetrievalResult(memory=memory, score=final_score),
@@ -187,15 +170,11 @@ class MemoryRetriever:
         # 5. Sort by final_score descending
         scored_results.sort(key=lambda pair: pair[0].score, reverse=True)
 
-        # 6. Apply minimum threshold and dynamic top_k
-        filtered: list[RetrievalResult] = []
-        dropped_details: list[dict] = []
-
-        for result, details in scored_results:
-            if result.score >= min_score and len(filtered) < top_k:
-                filtered.append(result)
-            else:
-                dropped_details.append(details)
+        # 6. Apply minimum threshold and dynamic top_k (sorted, so a prefix)
+        filtered = [
+            result for result, _ in scored_results[:top_k] if result.score >= min_score
+        ]
+        dropped = scored_results[len(filtered):]
 
         logger.info(
             "retrieve: query=%r | candidates=%d | kept=%d | dropped=%d | "
@@ -203,11 +182,11 @@ class MemoryRetriever:
             query,
             len(scored_results),
             len(filtered),
-            len(dropped_details),
+            len(dropped),
             min_score,
             top_k,
         )
-        if dropped_details:
-            logger.debug("dropped candidates: %s", dropped_details)
+        if dropped and debug:
+            logger.debug("dropped candidates: %s", [details for _, details in dropped])
 
         return filtered
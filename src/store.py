@@ -2,35 +2,76 @@
 
 from __future__ import annotations
 
+import functools
+import hashlib
 import json
 import os
 import sqlite3
 import struct
 import time
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
+import numpy as np
 import sqlite_vec
 from sentence_transformers import SentenceTransformer
 
 from .models import Memory, DistilledMemory, STOPWORDS
 
 
-def _serialize_f32(vector: list[float]) -> bytes:
+def _serialize_f32(vector: list[float] | np.ndarray) -> bytes:
     """Serialize a list of floats into bytes for sqlite-vec."""
+    if isinstance(vector, np.ndarray):
+        return vector.astype(np.float32, copy=False).tobytes()
     return struct.pack(f"{len(vector)}f", *vector)
 
 
+def _chunked(items: list, size: int):
+    """Yield consecutive slices of *items* of at most *size* elements."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
 class MemoryStore:
     """Persistent memory store backed by SQLite + sqlite-vec + FTS5."""
 
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"
     EMBEDDING_DIM = 384
 
-    def __init__(self, db_path: str = "memory.db"):
+    # Connection tuning: WAL + synchronous=NORMAL commit without fsyncing the DB file
+    JOURNAL_MODE = "WAL"
+    SYNCHRONOUS = "NORMAL"
+    MMAP_SIZE = 256 * 1024 * 1024
+
+    # Values bound per "IN (...)" list; keeps large id sets under SQLite's
+    # host-parameter limit (999 before 3.32)
+    IN_CHUNK = 500
+
+    # Query embeddings kept in process (float32, ~1.5 KB each)
+    QUERY_CACHE_SIZE = 10_000
+
+    def __init__(
+        self,
+        db_path: str = "memory.db",
+        journal_mode: str | None = JOURNAL_MODE,
+        synchronous: str | None = SYNCHRONOUS,
+        mmap_size: int | None = MMAP_SIZE,
+    ):
         self.db_path = db_path
-        self.db = sqlite3.connect(db_path)
+        # One connection for the store's lifetime; sqlite3 caches its prepared statements
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
         self.db.row_factory = sqlite3.Row
         
+        # Durability/IO tuning (None keeps SQLite's default)
+        if journal_mode:
+            self.db.execute(f"PRAGMA journal_mode={journal_mode}")
+        if synchronous:
+            self.db.execute(f"PRAGMA synchronous={synchronous}")
+        if mmap_size is not None:
+            self.db.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+            self.db.execute("PRAGMA temp_store=MEMORY")
+        
         # Load sqlite-vec extension
         self.db.enable_load_extension(True)
         sqlite_vec.load(self.db)
@@ -38,6 +79,21 @@ class MemoryStore:
         
         self._init_tables()
         
+        # >0 while inside batch(): per-write commits are deferred
+        self._batch_depth = 0
+        
+        # Read caches for the per-turn path, kept current by the write methods;
+        # profile_version is bumped on every profile change
+        self._profile: dict[str, str] | None = None
+        self._active_count: int | None = None
+        self.profile_version = 0
+        
+        # LRU of query text -> float32 embedding, per store; prefetch_embedding()
+        # fills it ahead of time
+        self._encode_query = functools.lru_cache(maxsize=self.QUERY_CACHE_SIZE)(
+            self._encode
+        )
+        
         # Load embedding model (local, runs on CPU)
         self._embedder = None  # lazy load
     
@@ -76,12 +132,20 @@ class MemoryStore:
                 role        TEXT NOT NULL,
                 content     TEXT NOT NULL,
                 timestamp   REAL NOT NULL,
-                memories_retrieved TEXT DEFAULT '[]'
+                memories_retrieved TEXT DEFAULT '[]',
+                retrieved_count INTEGER DEFAULT 0
             );
 
             CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
                 key, value, category, content=''
             );
+
+            -- Embeddings of memory texts by content hash (see _embed_memory_texts)
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                content_hash TEXT PRIMARY KEY,
+                model        TEXT NOT NULL,
+                vec          BLOB NOT NULL
+            );
         """)
         
         # sqlite-vec virtual table — must check if exists differently
@@ -96,59 +160,296 @@ class MemoryStore:
         except sqlite3.OperationalError:
             pass  # already exists
         
+        # Older databases predate the denormalized retrieved_count column
+        turn_cols = {r["name"] for r in self.db.execute("PRAGMA table_info(turns)")}
+        if "retrieved_count" not in turn_cols:
+            self.db.execute("ALTER TABLE turns ADD COLUMN retrieved_count INTEGER DEFAULT 0")
+            self.db.execute(
+                "UPDATE turns SET retrieved_count = json_array_length(memories_retrieved)"
+            )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_turns_retcount ON turns(role, retrieved_count)"
+        )
+        
         self.db.commit()
 
+    def _commit(self):
+        """Commit the current write unless a batch() transaction is open."""
+        if not self._batch_depth:
+            self.db.commit()
+
+    @contextmanager
+    def batch(self):
+        """Group all writes made inside the block into a single transaction.
+
+        Per-call commits are deferred and issued once when the outermost
+        batch exits, amortising the fsync cost over many writes.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.db.commit()
+
+    @contextmanager
+    def savepoint(self):
+        """Like batch(), but the block's writes are rolled back if it raises.
+
+        The block runs under an SQLite savepoint, so inside an outer batch
+        only its own writes are undone.  The read caches are dropped on
+        rollback and reload on next use.
+        """
+        with self.batch():
+            if not self.db.in_transaction:
+                self.db.execute("BEGIN")
+            self.db.execute("SAVEPOINT block")
+            try:
+                yield self
+            except BaseException:
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK TO block")
+                self._profile = None
+                self._active_count = None
+                self.profile_version += 1
+                raise
+            finally:
+                if self.db.in_transaction:
+                    self.db.execute("RELEASE block")
+
     def embed(self, text: str) -> list[float]:
         """Generate embedding for text. Returns list of floats."""
-        return self.embedder.encode(text).tolist()
+        return self._encode_query(text).tolist()
+
+    def _encode(self, text: str) -> np.ndarray:
+        return np.asarray(self.embedder.encode(text), dtype=np.float32)
+
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
+        """Embed several texts in one encoder pass. Returns a float32 (n, dim) array."""
+        if not texts:
+            return np.empty((0, self.EMBEDDING_DIM), dtype=np.float32)
+        return np.asarray(self.embedder.encode(texts), dtype=np.float32)
+
+    def prefetch_embedding(self, text: str):
+        """Embed *text* ahead of time so the next ``embed(text)`` is a cache hit."""
+        self._encode_query(text)
+
+    def _content_hash(self, text: str) -> str:
+        return hashlib.blake2b(
+            f"{self.EMBEDDING_MODEL}:{text}".encode(), digest_size=16
+        ).hexdigest()
+
+    def _embed_memory_texts(self, texts: list[str]) -> np.ndarray:
+        """Like embed_batch(), but reuses vectors from the embedding_cache table.
+
+        Only texts never embedded before go through the encoder; their vectors
+        are inserted into the cache without committing.
+        """
+        hashes = [self._content_hash(t) for t in texts]
+        by_hash = dict(zip(hashes, texts))
+        found: dict[str, np.ndarray] = {}
+        for chunk in _chunked(list(by_hash), self.IN_CHUNK):
+            placeholders = ",".join("?" * len(chunk))
+            for content_hash, blob in self.db.execute(
+                "SELECT content_hash, vec FROM embedding_cache "
+                f"WHERE content_hash IN ({placeholders})", chunk
+            ):
+                found[content_hash] = np.frombuffer(blob, dtype=np.float32)
+        missing = [h for h in by_hash if h not in found]
+        if missing:
+            fresh = self.embed_batch([by_hash[h] for h in missing])
+            self.db.executemany(
+                "INSERT OR IGNORE INTO embedding_cache (content_hash, model, vec) "
+                "VALUES (?, ?, ?)",
+                [(h, self.EMBEDDING_MODEL, _serialize_f32(e)) for h, e in zip(missing, fresh)]
+            )
+            found.update(zip(missing, fresh))
+        return np.stack([found[h] for h in hashes])
 
     def add_memory(self, mem: DistilledMemory, turn_id: int) -> str:
         """Insert a new memory into all three stores. Returns memory ID."""
-        mem_id = Memory.generate_id()
+        return self.add_memories([mem], turn_id)[0]
+
+    def add_memories(self, mems: list[DistilledMemory], turn_id: int) -> list[str]:
+        """Insert several memories with one embedding batch and grouped inserts.
+
+        Returns the new memory IDs in input order.
+        """
+        if not mems:
+            return []
         now = time.time()
+        mem_ids = [Memory.generate_id() for _ in mems]
         
         # 1. Main table
-        self.db.execute("""
+        self.db.executemany("""
             INSERT INTO memories (id, type, category, key, value, source_turn,
                                   confidence, created_at, updated_at, is_active)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-        """, (mem_id, mem.type, mem.category, mem.key, mem.value,
-              turn_id, mem.confidence, now, now))
+        """, [
+            (mem_id, m.type, m.category, m.key, m.value, turn_id, m.confidence, now, now)
+            for mem_id, m in zip(mem_ids, mems)
+        ])
         
         # 2. FTS index
         # FTS5 rowid is manually managed to match memories table rowid
-        rowid = self.db.execute("SELECT last_insert_rowid()").fetchone()[0]
-        self.db.execute(
+        rowids = {}
+        for chunk in _chunked(mem_ids, self.IN_CHUNK):
+            placeholders = ",".join("?" * len(chunk))
+            rowids.update(self.db.execute(
+                f"SELECT id, rowid FROM memories WHERE id IN ({placeholders})", chunk
+            ).fetchall())
+        self.db.executemany(
             "INSERT INTO memories_fts(rowid, key, value, category) VALUES (?, ?, ?, ?)",
-            (rowid, mem.key, mem.value, mem.category)
+            [(rowids[mem_id], m.key, m.value, m.category) for mem_id, m in zip(mem_ids, mems)]
         )
         
-        # 3. Vector index
-        embed_text = f"{mem.key}: {mem.value}"
-        embedding = self.embed(embed_text)
-        self.db.execute(
+        # 3. Vector index (one encoder pass for any texts not embedded before)
+        embeddings = self._embed_memory_texts([f"{m.key}: {m.value}" for m in mems])
+        self.db.executemany(
             "INSERT INTO memories_vec(id, embedding) VALUES (?, ?)",
-            (mem_id, _serialize_f32(embedding))
+            [(mem_id, _serialize_f32(e)) for mem_id, e in zip(mem_ids, embeddings)]
         )
         
         # 4. Profile update for preferences/facts/constraints
-        if mem.type in ("preference", "fact", "constraint"):
-            self.db.execute(
+        profile_mems = [m for m in mems if m.type in ("preference", "fact", "constraint")]
+        if profile_mems:
+            self.db.executemany(
                 "INSERT OR REPLACE INTO profile (key, value, updated_at, source_turn) "
                 "VALUES (?, ?, ?, ?)",
-                (mem.key, mem.value, now, turn_id)
+                [(m.key, m.value, now, turn_id) for m in profile_mems]
             )
+            if self._profile is not None:
+                self._profile.update((m.key, m.value) for m in profile_mems)
+            self.profile_version += 1
         
-        self.db.commit()
-        return mem_id
+        self._adjust_active_count(len(mems))
+        self._commit()
+        return mem_ids
 
     def deactivate_by_key(self, key: str):
         """Soft-delete all active memories with this key."""
-        self.db.execute(
+        cur = self.db.execute(
             "UPDATE memories SET is_active = 0, updated_at = ? WHERE key = ? AND is_active = 1",
             (time.time(), key)
         )
-        self.db.commit()
+        self._adjust_active_count(-cur.rowcount)
+        self._commit()
+
+    def deactivate_by_keys(self, keys: list[str]) -> int:
+        """Soft-delete all active memories with any of these keys.
+
+        Returns the number of memories deactivated.
+        """
+        return self._deactivate_in("key", keys)
+
+    def deactivate_by_id(self, mem_id: str):
+        """Soft-delete a single memory by ID."""
+        cur = self.db.execute(
+            "UPDATE memories SET is_active = 0, updated_at = ? WHERE id = ? AND is_active = 1",
+            (time.time(), mem_id)
+        )
+        self._adjust_active_count(-cur.rowcount)
+        self._commit()
+
+    def deactivate_by_ids(self, mem_ids: list[str]) -> int:
+        """Soft-delete several memories by ID.
+
+        Returns the number of memories deactivated.
+        """
+        return self._deactivate_in("id", mem_ids)
+
+    def _deactivate_in(self, column: str, values: list[str]) -> int:
+        """Soft-delete active memories whose *column* is in *values*.
+
+        One UPDATE per IN_CHUNK values, all stamped with the same time and
+        committed together.
+        """
+        if not values:
+            return 0
+        now = time.time()
+        deactivated = 0
+        for chunk in _chunked(values, self.IN_CHUNK):
+            placeholders = ",".join("?" * len(chunk))
+            deactivated += self.db.execute(
+                "UPDATE memories SET is_active = 0, updated_at = ? "
+                f"WHERE {column} IN ({placeholders}) AND is_active = 1",
+                (now, *chunk)
+            ).rowcount
+        self._adjust_active_count(-deactivated)
+        self._commit()
+        return deactivated
+
+    def deactivate_below_confidence(self, min_confidence: float) -> int:
+        """Soft-delete every active memory with confidence < *min_confidence*.
+
+        Returns the number of memories deactivated.
+        """
+        cur = self.db.execute(
+            "UPDATE memories SET is_active = 0, updated_at = ? "
+            "WHERE is_active = 1 AND confidence < ?",
+            (time.time(), min_confidence)
+        )
+        self._adjust_active_count(-cur.rowcount)
+        self._commit()
+        return cur.rowcount
+
+    def decay_stale(self, stale_before: int, decay_factor: float) -> int:
+        """Multiply the confidence of stale memories by *decay_factor*.
+
+        Stale means active, used at least once, and last used before turn
+        *stale_before*.  Returns the number of memories decayed.
+        """
+        decayed = self.db.execute(
+            """
+            UPDATE memories
+            SET confidence = round(confidence * ?, 6), updated_at = ?
+            WHERE is_active = 1 AND last_used_turn > 0 AND last_used_turn < ?
+            """,
+            (decay_factor, time.time(), stale_before),
+        ).rowcount
+        if decayed:
+            self._commit()
+        return decayed
+
+    def decay_and_expire(
+        self, stale_before: int, decay_factor: float, min_confidence: float
+    ) -> tuple[int, int]:
+        """Decay stale memories and expire low-confidence ones in one statement.
+
+        Active memories last used before turn *stale_before* (and used at
+        least once) have their confidence multiplied by *decay_factor*; any
+        active memory whose resulting confidence is below *min_confidence* is
+        soft-deleted.  Returns ``(decayed, expired)``.
+        """
+        stale = "last_used_turn > 0 AND last_used_turn < :stale_before"
+        new_conf = f"CASE WHEN {stale} THEN round(confidence * :factor, 6) ELSE confidence END"
+        rows = self.db.execute(
+            f"""
+            UPDATE memories
+            SET confidence = {new_conf},
+                is_active = {new_conf} >= :min_conf,
+                updated_at = :now
+            WHERE is_active = 1 AND ({stale} OR {new_conf} < :min_conf)
+            RETURNING {stale}, is_active
+            """,
+            {
+                "stale_before": stale_before,
+                "factor": decay_factor,
+                "min_conf": min_confidence,
+                "now": time.time(),
+            },
+        ).fetchall()
+        decayed = sum(1 for r in rows if r[0])
+        expired = sum(1 for r in rows if not r[1])
+        self._adjust_active_count(-expired)
+        if rows:
+            self._commit()
+        return decayed, expired
+
+    def _adjust_active_count(self, delta: int):
+        if self._active_count is not None:
+            self._active_count += delta
 
     def touch_memory(self, mem_id: str, turn_id: int):
         """Update last_used_turn for a memory when it's retrieved."""
@@ -156,14 +457,48 @@ class MemoryStore:
             "UPDATE memories SET last_used_turn = ? WHERE id = ?",
             (turn_id, mem_id)
         )
-        self.db.commit()
+        self._commit()
+
+    def touch_memories(self, mem_ids: list[str], turn_id: int):
+        """Update last_used_turn for several retrieved memories, IN_CHUNK ids per statement."""
+        if not mem_ids:
+            return
+        for chunk in _chunked(mem_ids, self.IN_CHUNK):
+            placeholders = ",".join("?" * len(chunk))
+            self.db.execute(
+                f"UPDATE memories SET last_used_turn = ? WHERE id IN ({placeholders})",
+                (turn_id, *chunk)
+            )
+        self._commit()
 
     def get_active_memories(self) -> list[Memory]:
         """Get all active memories, ordered by confidence desc."""
-        rows = self.db.execute(
+        return list(self.iter_active_memories())
+
+    def iter_active_memories(self, batch_size: int = 1024) -> Iterator[Memory]:
+        """Stream active memories (confidence desc) off a cursor, *batch_size* rows at a time."""
+        cur = self.db.execute(
             "SELECT * FROM memories WHERE is_active = 1 ORDER BY confidence DESC"
-        ).fetchall()
-        return [self._row_to_memory(r) for r in rows]
+        )
+        while rows := cur.fetchmany(batch_size):
+            for r in rows:
+                yield self._row_to_memory(r)
+
+    def iter_active_embeddings(
+        self, batch_size: int = 1024
+    ) -> Iterator[tuple[str, np.ndarray]]:
+        """Stream ``(id, float32 vector)`` for every active memory, in no set order.
+
+        One join over the sqlite-vec table, so there is no bound-parameter
+        list to outgrow on large stores.
+        """
+        cur = self.db.execute(
+            "SELECT m.id, v.embedding FROM memories m "
+            "JOIN memories_vec v ON v.id = m.id WHERE m.is_active = 1"
+        )
+        while rows := cur.fetchmany(batch_size):
+            for mem_id, blob in rows:
+                yield mem_id, np.frombuffer(blob, dtype=np.float32)
 
     def find_by_key(self, key: str) -> Memory | None:
         """Find an active memory by key. Returns first match or None."""
@@ -173,24 +508,68 @@ class MemoryStore:
         ).fetchone()
         return self._row_to_memory(row) if row else None
 
+    def find_by_keys(self, keys: list[str]) -> dict[str, Memory]:
+        """Find active memories for several keys at once. Returns {key: first match}."""
+        if not keys:
+            return {}
+        found: dict[str, Memory] = {}
+        for chunk in _chunked(list(keys), self.IN_CHUNK):
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.db.execute(
+                f"SELECT * FROM memories WHERE key IN ({placeholders}) AND is_active = 1",
+                chunk
+            ).fetchall()
+            for r in rows:
+                if r["key"] not in found:
+                    found[r["key"]] = self._row_to_memory(r)
+        return found
+
     def get_profile(self) -> dict[str, str]:
         """Get the current user profile as a dict."""
-        rows = self.db.execute("SELECT key, value FROM profile").fetchall()
-        return {r["key"]: r["value"] for r in rows}
+        if self._profile is None:
+            rows = self.db.execute("SELECT key, value FROM profile").fetchall()
+            self._profile = {r["key"]: r["value"] for r in rows}
+        return dict(self._profile)
 
     def active_count(self) -> int:
         """Count of active memories."""
-        return self.db.execute(
-            "SELECT COUNT(*) FROM memories WHERE is_active = 1"
-        ).fetchone()[0]
+        if self._active_count is None:
+            self._active_count = self.db.execute(
+                "SELECT COUNT(*) FROM memories WHERE is_active = 1"
+            ).fetchone()[0]
+        return self._active_count
 
     def search_vector(self, query: str, top_k: int = 10) -> list[tuple[str, float]]:
         """Vector similarity search. Returns list of (memory_id, distance)."""
-        query_emb = self.embed(query)
+        return self.search_embedding(self.embed(query), top_k=top_k)
+
+    def load_embeddings(self, mem_ids: list[str]) -> np.ndarray:
+        """Stored vectors for *mem_ids* as one float32 (n, dim) array, in order.
+
+        Reads the sqlite-vec rows directly, so no text is re-embedded.
+        """
+        out = np.empty((len(mem_ids), self.EMBEDDING_DIM), dtype=np.float32)
+        if not mem_ids:
+            return out
+        pos = {mem_id: i for i, mem_id in enumerate(mem_ids)}
+        for chunk in _chunked(list(pos), self.IN_CHUNK):
+            placeholders = ",".join("?" * len(chunk))
+            for mem_id, blob in self.db.execute(
+                f"SELECT id, embedding FROM memories_vec WHERE id IN ({placeholders})", chunk
+            ):
+                out[pos.pop(mem_id)] = np.frombuffer(blob, dtype=np.float32)
+        if pos:
+            raise KeyError(f"no stored embedding for {sorted(pos)}")
+        return out
+
+    def search_embedding(
+        self, embedding: list[float] | np.ndarray, top_k: int = 10
+    ) -> list[tuple[str, float]]:
+        """Vector similarity search for an already-computed embedding."""
         # Using MATCH syntax with k=? as per gotchas
         rows = self.db.execute(
             "SELECT id, distance FROM memories_vec WHERE embedding MATCH ? AND k = ? ORDER BY distance",
-            (_serialize_f32(query_emb), top_k)
+            (_serialize_f32(embedding), top_k)
         ).fetchall()
         return [(r[0], r[1]) for r in rows]
 
@@ -223,16 +602,38 @@ class MemoryStore:
         ).fetchone()
         return self._row_to_memory(row) if row else None
 
+    def rowids_to_memory_ids(self, rowids: list[int]) -> dict[int, str]:
+        """Map several FTS rowids back to memory IDs, IN_CHUNK rowids per query."""
+        found: dict[int, str] = {}
+        for chunk in _chunked(rowids, self.IN_CHUNK):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self.db.execute(
+                f"SELECT rowid, id FROM memories WHERE rowid IN ({placeholders})", chunk
+            ).fetchall())
+        return found
+
+    def get_memories_by_ids(self, mem_ids: list[str]) -> dict[str, Memory]:
+        """Fetch several active memories by ID, IN_CHUNK ids per query. Returns {id: Memory}."""
+        found: dict[str, Memory] = {}
+        for chunk in _chunked(mem_ids, self.IN_CHUNK):
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.db.execute(
+                f"SELECT * FROM memories WHERE id IN ({placeholders}) AND is_active = 1", chunk
+            ).fetchall()
+            found.update((r["id"], self._row_to_memory(r)) for r in rows)
+        return found
+
     def log_turn(self, turn_id: int, role: str, content: str, 
                  memories_retrieved: list[str] | None = None):
         """Log a conversation turn."""
+        memories_retrieved = memories_retrieved or []
         self.db.execute(
-            "INSERT OR REPLACE INTO turns (turn_id, role, content, timestamp, memories_retrieved) "
-            "VALUES (?, ?, ?, ?, ?)",
+            "INSERT OR REPLACE INTO turns (turn_id, role, content, timestamp, "
+            "memories_retrieved, retrieved_count) VALUES (?, ?, ?, ?, ?, ?)",
             (turn_id, role, content, time.time(), 
-             json.dumps(memories_retrieved or []))
+             json.dumps(memories_retrieved), len(memories_retrieved))
         )
-        self.db.commit()
+        self._commit()
 
     def get_last_turn_id(self) -> int:
         """Get the last turn_id from the database. Returns 0 if no turns exist."""
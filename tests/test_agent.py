@@ -0,0 +1,76 @@
+"""Tests for LongMemAgent's flush and turn bookkeeping."""
+
+import sys
+from unittest.mock import MagicMock
+
+sys.path.insert(0, "/home/pik/dev/longmem")
+
+import pytest
+
+from src.agent import LongMemAgent
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # snapshots/ is written relative to cwd
+    a = LongMemAgent(provider="ollama", db_path=str(tmp_path / "test.db"))
+    yield a
+    a.store.db.close()
+
+
+# ---------------------------------------------------------------------------
+# Flush
+# ---------------------------------------------------------------------------
+
+class TestFlush:
+    def test_flush_snapshots_and_consolidates(self, agent, tmp_path):
+        agent.consolidator.run_consolidation = MagicMock()
+        agent.total_flushes = 4  # first flush also consolidates
+
+        with agent.store.batch():
+            agent._flush()
+            agent._flush()
+
+        assert agent.total_flushes == 6
+        agent.consolidator.run_consolidation.assert_called_once_with(0)
+        assert (tmp_path / "snapshots" / "turn_00000.md").exists()
+
+
+# ---------------------------------------------------------------------------
+# Failed LLM requests
+# ---------------------------------------------------------------------------
+
+def _raw_reply(content: str):
+    raw = MagicMock()
+    raw.parse.return_value.choices = [MagicMock()]
+    raw.parse.return_value.choices[0].message.content = content
+    raw.headers = {}
+    return raw
+
+
+class TestFailedRequest:
+    def test_failed_turn_is_not_logged(self, agent):
+        agent.client = MagicMock()
+        create = agent.client.chat.completions.with_raw_response.create
+        create.side_effect = [RuntimeError("429"), _raw_reply("hello")]
+        with pytest.raises(RuntimeError):
+            agent.chat("hi there")
+        assert agent.store.get_last_turn_id() == 0
+
+        result = agent.chat("hi there")
+        assert result["response"] == "hello"
+        assert create.call_count == 2
+        rows = agent.store.db.execute("SELECT turn_id FROM turns").fetchall()
+        assert [r["turn_id"] for r in rows] == [result["turn_id"]]
+
+    def test_failed_turn_rolled_back_inside_batch(self, agent):
+        agent.client = MagicMock()
+        create = agent.client.chat.completions.with_raw_response.create
+        create.side_effect = [_raw_reply("one"), RuntimeError("413"), _raw_reply("two")]
+        with agent.store.batch():
+            first = agent.chat("first")
+            with pytest.raises(RuntimeError):
+                agent.chat("second")
+            second = agent.chat("second")
+        rows = agent.store.db.execute("SELECT turn_id FROM turns").fetchall()
+        assert [r["turn_id"] for r in rows] == [first["turn_id"], second["turn_id"]]
@@ -5,6 +5,7 @@ import time
 
 sys.path.insert(0, "/home/pik/dev/longmem")
 
+import numpy as np
 import pytest
 
 from src.store import MemoryStore
@@ -76,6 +77,46 @@ class TestFindDuplicates:
         # At minimum, no errors should occur
         assert isinstance(groups, list)
 
+    def test_vector_pass_groups_near_identical_memories(self, store, consolidator):
+        """Reworded keys with the same value group together; unrelated ones don't."""
+        store.add_memory(_make_memory("home_city", "Lives in Bangalore, India"), turn_id=1)
+        store.add_memory(_make_memory("city_home", "Lives in Bangalore, India"), turn_id=2)
+        store.add_memory(_make_memory("favorite_color", "Blue"), turn_id=3)
+
+        groups = consolidator.find_duplicates()
+        assert len(groups) == 1
+        members = {groups[0].canonical.key} | {m.key for m in groups[0].duplicates}
+        assert members == {"home_city", "city_home"}
+        assert groups[0].similarity >= consolidator.SIMILARITY_THRESHOLD
+
+    def test_vector_pass_groups_transitively(self, store, consolidator, monkeypatch):
+        """A~B and B~C land in one group even when A and C are dissimilar."""
+        store.add_memory(_make_memory("a", "first"), turn_id=1)
+        store.add_memory(_make_memory("b", "second"), turn_id=2)
+        store.add_memory(_make_memory("c", "third"), turn_id=3)
+        store.add_memory(_make_memory("d", "fourth"), turn_id=4)
+
+        # Unit vectors 0.45 rad apart: neighbours ~0.90, a/c ~0.62, d orthogonal
+        angles = {"a": 0.0, "b": 0.45, "c": 0.9}
+        by_id = {m.id: m.key for m in store.get_active_memories()}
+
+        def fake_embeddings():
+            for mem_id, key in by_id.items():
+                vec = np.zeros(store.EMBEDDING_DIM, dtype=np.float32)
+                if key in angles:
+                    vec[:2] = np.cos(angles[key]), np.sin(angles[key])
+                else:
+                    vec[2] = 1.0
+                yield mem_id, vec
+
+        monkeypatch.setattr(store, "iter_active_embeddings", fake_embeddings)
+
+        groups = consolidator.find_duplicates()
+        assert len(groups) == 1
+        members = {groups[0].canonical.key} | {m.key for m in groups[0].duplicates}
+        assert members == {"a", "b", "c"}
+        assert groups[0].similarity == pytest.approx(np.cos(0.45), abs=1e-4)
+
     def test_no_duplicates(self, store, consolidator):
         """Unrelated memories should not be grouped."""
         store.add_memory(_make_memory("user_name", "Arjun"), turn_id=1)
@@ -126,6 +167,18 @@ class TestMergeDuplicates:
         # The canonical should be the higher-confidence one
         assert active[0].confidence == 0.95
 
+    def test_merge_counts_only_active_duplicates(self, store, consolidator):
+        """A duplicate deactivated since detection isn't counted as merged."""
+        store.add_memory(_make_memory("user_name", "Arjun", confidence=0.7), turn_id=1)
+        store.add_memory(_make_memory("user_name", "Arjun K", confidence=0.8), turn_id=2)
+        store.add_memory(_make_memory("user_name", "Arjun Kumar", confidence=0.95), turn_id=5)
+
+        groups = consolidator.find_duplicates()
+        store.deactivate_by_id(groups[0].duplicates[0].id)
+
+        assert consolidator.merge_duplicates(groups) == 1
+        assert store.active_count() == 1
+
     def test_merge_empty_groups(self, consolidator):
         """Merging empty groups should return 0."""
         assert consolidator.merge_duplicates([]) == 0
@@ -173,6 +226,18 @@ class TestDecayStale:
         decayed = consolidator.decay_stale(current_turn=500, decay_threshold=200)
         assert decayed == 0
 
+    def test_decay_defers_commit_inside_batch(self, store, consolidator):
+        """Inside a store batch the decay is committed with the batch."""
+        mem_id = store.add_memory(
+            _make_memory("user_name", "Arjun", confidence=0.9), turn_id=1
+        )
+        store.touch_memory(mem_id, turn_id=10)
+
+        with store.batch():
+            assert consolidator.decay_stale(current_turn=300, decay_threshold=200) == 1
+            assert store.db.in_transaction
+        assert not store.db.in_transaction
+
 
 # ---------------------------------------------------------------------------
 # Expiration tests
@@ -210,6 +275,40 @@ class TestExpireLowConfidence:
         assert store.get_memory_by_id(mem_id) is not None
 
 
+class TestDecayAndExpire:
+    def test_matches_separate_steps(self, store, consolidator):
+        """One-pass decay+expire decays stale memories and expires low ones."""
+        stale_id = store.add_memory(
+            _make_memory("stale", "x", confidence=0.9), turn_id=1
+        )
+        store.touch_memory(stale_id, turn_id=10)
+        tipped_id = store.add_memory(
+            _make_memory("tipped", "x", confidence=0.32), turn_id=1
+        )
+        store.touch_memory(tipped_id, turn_id=10)
+        low_id = store.add_memory(
+            _make_memory("low", "x", confidence=0.2), turn_id=1
+        )
+        fresh_id = store.add_memory(
+            _make_memory("fresh", "x", confidence=0.9), turn_id=1
+        )
+        store.touch_memory(fresh_id, turn_id=290)
+        assert store.active_count() == 4
+
+        decayed, expired = consolidator.decay_and_expire(current_turn=300)
+        assert (decayed, expired) == (2, 2)
+
+        assert store.get_memory_by_id(stale_id).confidence == pytest.approx(0.81)
+        assert store.get_memory_by_id(tipped_id) is None  # 0.288 < 0.3
+        assert store.get_memory_by_id(low_id) is None
+        assert store.get_memory_by_id(fresh_id).confidence == 0.9
+        assert store.active_count() == 2
+
+    def test_nothing_to_do(self, store, consolidator):
+        store.add_memory(_make_memory("fact", "x", confidence=0.9), turn_id=1)
+        assert consolidator.decay_and_expire(current_turn=300) == (0, 0)
+
+
 # ---------------------------------------------------------------------------
 # Full pipeline test
 # ---------------------------------------------------------------------------
@@ -242,6 +341,7 @@ class TestRunConsolidation:
         assert report.duplicates_merged >= 1
         assert report.memories_expired >= 1  # low-confidence one
         assert report.total_active_after < report.total_active_before
+        assert report.total_active_after == store.active_count()
 
     def test_empty_store(self, store, consolidator):
         """Consolidation on empty store should work gracefully."""
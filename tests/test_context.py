@@ -79,6 +79,20 @@ class TestAddMessage:
         ctx.add_message("user", "How are you?")
         assert ctx.message_count() == 3
 
+    def test_add_message_with_precounted_tokens(self, ctx):
+        ctx.add_message("user", "Hello there", tokens=ctx.count_tokens("Hello there"))
+        assert ctx.total_tokens() == ctx.count_tokens("Hello there") + 4
+        assert ctx.messages == [{"role": "user", "content": "Hello there"}]
+
+    def test_add_message_estimates_at_low_utilization(self, ctx):
+        ctx.add_message("assistant", "x" * 400)
+        assert ctx.total_tokens() == 400 // ctx.CHARS_PER_TOKEN + 4
+
+    def test_add_message_counts_non_ascii_exactly(self, ctx):
+        text = "ನಾನು ಕನ್ನಡ ಮಾತನಾಡುತ್ತೇನೆ"
+        ctx.add_message("assistant", text)
+        assert ctx.total_tokens() == ctx.count_tokens(text) + 4
+
     def test_add_message_increases_tokens(self, ctx):
         tokens_before = ctx.total_tokens()
         ctx.add_message("user", "This is a test message.")
@@ -145,6 +159,24 @@ class TestNeedsFlush:
         ctx.set_system_prompt("Short.")
         assert ctx.needs_flush(incoming_tokens=10) is False
 
+    def test_estimates_made_exact_near_threshold(self, small_ctx):
+        """Estimated costs are recounted once the projection nears the limit."""
+        text = "a b c d e f g h i j k l m n o p q r s t"
+        small_ctx.add_message("user", text)
+        assert small_ctx.total_tokens() == small_ctx.estimate_tokens(text) + 4
+
+        small_ctx.needs_flush(incoming_tokens=50)
+        assert small_ctx.total_tokens() == small_ctx.count_tokens(text) + 4
+
+    def test_flush_fires_for_non_latin_reply(self, small_ctx):
+        """A Kannada reply past the exact-count threshold triggers the flush."""
+        reply = "ನಮಸ್ಕಾರ " * 15
+        assert small_ctx.count_tokens(reply) + 4 >= 70
+        assert len(reply) // 4 + 4 < 60  # a chars/4 estimate would miss it
+
+        small_ctx.add_message("assistant", reply)
+        assert small_ctx.needs_flush() is True
+
 
 # ---------------------------------------------------------------------------
 # Tokens remaining
@@ -221,6 +253,15 @@ class TestGetConversationText:
         text = ctx.get_conversation_text()
         assert text == ""
 
+    def test_after_reset_only_carried_over_lines(self, ctx):
+        for i in range(6):
+            ctx.add_message("user" if i % 2 == 0 else "assistant", f"message {i}")
+        ctx.reset("New prompt.")
+
+        assert ctx.get_conversation_text() == (
+            "USER: message 2\n\nASSISTANT: message 3\n\nUSER: message 4\n\nASSISTANT: message 5"
+        )
+
 
 # ---------------------------------------------------------------------------
 # Reset
@@ -245,8 +286,9 @@ class TestReset:
 
     def test_reset_recalculates_tokens(self, ctx):
         ctx.set_system_prompt("Old prompt.")
-        ctx.add_message("user", "A" * 500)
-        ctx.add_message("assistant", "B" * 500)
+        # Pre-counted, so the comparison isn't skewed by estimates made exact
+        ctx.add_message("user", "A" * 500, tokens=ctx.count_tokens("A" * 500))
+        ctx.add_message("assistant", "B" * 500, tokens=ctx.count_tokens("B" * 500))
 
         tokens_before = ctx.total_tokens()
         ctx.reset("Short.")
@@ -255,6 +297,16 @@ class TestReset:
         # Should be less since system prompt is shorter and some messages dropped
         assert tokens_after <= tokens_before
 
+    def test_reset_tokens_match_fresh_count(self, ctx):
+        for i in range(6):
+            ctx.add_message("user", f"question number {i} " * (i + 1))
+        ctx.reset("New system prompt.")
+
+        expected = ctx.count_tokens("New system prompt.") + 4 + sum(
+            ctx.count_tokens(m["content"]) + 4 for m in ctx.messages
+        )
+        assert ctx.total_tokens() == expected
+
     def test_reset_empty_context(self, ctx):
         ctx.reset("New prompt.")
         assert ctx.message_count() == 0
@@ -351,3 +351,67 @@ class TestTwoPassPipeline:
 
         assert len(results) == 1
         assert results[0].key == "user_name"
+
+    def test_existing_memory_lines_track_changes(self):
+        """Reused prompt lines still reflect updated confidences."""
+        reply = MagicMock()
+        reply.choices = [MagicMock()]
+        reply.choices[0].message.content = json.dumps({"memories": []})
+        reply.usage = None
+        client = MagicMock()
+        client.chat.completions.create = MagicMock(return_value=reply)
+        distiller = MemoryDistiller(client=client)
+        name = _make_existing_memory()
+        city = _make_existing_memory(key="home_city", value="Pune")
+
+        distiller.distill("USER: hi", [name, city], 1, 2)
+        city.confidence = 0.5
+        distiller.distill("USER: hi again", [name, city], 3, 4)
+
+        first, second = (
+            c.kwargs["messages"][0]["content"]
+            for c in client.chat.completions.create.call_args_list
+        )
+        assert "- [fact] user_name: Arjun (confidence: 0.90, from turn 1)" in first
+        assert "- [fact] home_city: Pune (confidence: 0.90, from turn 1)" in first
+        assert "- [fact] user_name: Arjun (confidence: 0.90, from turn 1)" in second
+        assert "- [fact] home_city: Pune (confidence: 0.50, from turn 1)" in second
+
+
+# ---------------------------------------------------------------------------
+# Response parsing
+# ---------------------------------------------------------------------------
+
+class TestParseResponse:
+    def test_fenced_json(self):
+        distiller = MemoryDistiller(client=MagicMock())
+        raw = '```json\n{"memories": [{"action": "add", "type": "fact", "key": "pet", "value": "cat"}]}\n```'
+        [dm] = distiller._parse_response(raw)
+        assert (dm.key, dm.value) == ("pet", "cat")
+
+    def test_fenced_json_without_json_mode(self):
+        distiller = MemoryDistiller(client=MagicMock(), provider="openai")
+        raw = '```\n{"memories": [{"action": "add", "type": "fact", "key": "pet", "value": "cat"}]}\n```'
+        assert [dm.key for dm in distiller._parse_response(raw)] == ["pet"]
+
+    def test_non_strict_json_still_parses(self):
+        """NaN isn't strict JSON; it must parse the same with or without orjson."""
+        distiller = MemoryDistiller(client=MagicMock())
+        raw = '{"memories": [{"action": "add", "type": "fact", "key": "pet", "value": "cat", "confidence": NaN}]}'
+        [dm] = distiller._parse_response(raw)
+        assert dm.key == "pet"
+
+    def test_truncated_reply_keeps_complete_objects(self):
+        """Objects before the cut survive, including ones with nested values."""
+        distiller = MemoryDistiller(client=MagicMock())
+        raw = (
+            '{"memories": ['
+            '{"action": "add", "type": "entity", "key": "pets", "value": {"dog": "Rex"}}, '
+            '{"action": "add", "type": "fact", "key": "city", "value": "Pune"}, '
+            '{"action": "add", "type": "fact", "key": "note", "value": "cut { off'
+        )
+        memories = distiller._parse_response(raw)
+        assert [(dm.key, dm.value) for dm in memories] == [
+            ("pets", '{"dog": "Rex"}'),
+            ("city", "Pune"),
+        ]
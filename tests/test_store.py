@@ -1,6 +1,7 @@
 """Tests for the MemoryStore module."""
 
 import sys
+import sqlite3
 import time
 import os
 
@@ -60,6 +61,16 @@ class TestInitialization:
         assert "profile" in table_names
         assert "turns" in table_names
 
+    def test_defaults_to_wal(self, store):
+        assert store.db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert store.db.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    def test_tuning_can_be_disabled(self, tmp_path):
+        store = MemoryStore(
+            str(tmp_path / "plain.db"), journal_mode=None, synchronous=None, mmap_size=None,
+        )
+        assert store.db.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+
 
 # ---------------------------------------------------------------------------
 # add_memory
@@ -108,6 +119,29 @@ class TestAddMemory:
         profile = store.get_profile()
         assert "meeting_tue" not in profile
 
+    def test_add_memories_returns_ids_in_order(self, store):
+        ids = store.add_memories([
+            _make_memory(key="a", value="alpha"),
+            _make_memory(key="b", value="beta"),
+        ], turn_id=3)
+
+        assert [store.get_memory_by_id(i).key for i in ids] == ["a", "b"]
+        assert store.active_count() == 2
+
+    def test_add_memories_indexes_fts_and_vector(self, store):
+        ids = store.add_memories([
+            _make_memory(key="pet_name", value="Biscuit the beagle"),
+            _make_memory(key="home_city", value="Bangalore"),
+        ], turn_id=1)
+
+        fts = store.search_fts("beagle")
+        assert [store.rowid_to_memory_id(rowid) for rowid, _ in fts] == [ids[0]]
+        assert ids[1] in [mem_id for mem_id, _ in store.search_vector("home_city: Bangalore")]
+
+    def test_add_memories_empty_is_noop(self, store):
+        assert store.add_memories([], turn_id=1) == []
+        assert store.active_count() == 0
+
 
 # ---------------------------------------------------------------------------
 # deactivate_by_key
@@ -127,6 +161,15 @@ class TestDeactivate:
         store.deactivate_by_key("nonexistent")
         assert store.active_count() == 0
 
+    def test_deactivate_by_keys(self, store):
+        store.add_memory(_make_memory(key="a", value="alpha"), turn_id=1)
+        store.add_memory(_make_memory(key="b", value="beta"), turn_id=1)
+        store.add_memory(_make_memory(key="c", value="gamma"), turn_id=1)
+
+        store.deactivate_by_keys(["a", "c", "nonexistent"])
+        assert [m.key for m in store.get_active_memories()] == ["b"]
+        assert store.active_count() == 1
+
 
 # ---------------------------------------------------------------------------
 # touch_memory
@@ -144,6 +187,19 @@ class TestTouchMemory:
         stored = store.get_memory_by_id(mem_id)
         assert stored.last_used_turn == 42
 
+    def test_touch_memories_updates_only_given_ids(self, store):
+        id_a = store.add_memory(_make_memory(key="a", value="alpha"), turn_id=1)
+        id_b = store.add_memory(_make_memory(key="b", value="beta"), turn_id=1)
+        id_c = store.add_memory(_make_memory(key="c", value="gamma"), turn_id=1)
+
+        store.touch_memories([id_a, id_c], turn_id=7)
+        assert store.get_memory_by_id(id_a).last_used_turn == 7
+        assert store.get_memory_by_id(id_b).last_used_turn == 0
+        assert store.get_memory_by_id(id_c).last_used_turn == 7
+
+    def test_touch_memories_empty_is_noop(self, store):
+        store.touch_memories([], turn_id=7)
+
 
 # ---------------------------------------------------------------------------
 # find_by_key
@@ -170,6 +226,15 @@ class TestFindByKey:
         found = store.find_by_key("old_key")
         assert found is None
 
+    def test_find_by_keys(self, store):
+        store.add_memory(_make_memory(key="a", value="alpha"), turn_id=1)
+        store.add_memory(_make_memory(key="b", value="beta"), turn_id=1)
+        store.deactivate_by_key("b")
+
+        found = store.find_by_keys(["a", "b", "missing"])
+        assert list(found) == ["a"]
+        assert found["a"].value == "alpha"
+
 
 # ---------------------------------------------------------------------------
 # Search: vector
@@ -195,6 +260,54 @@ class TestSearchVector:
         results = store.search_vector("anything", top_k=5)
         assert results == []
 
+    def test_search_embedding_matches_search_vector(self, store):
+        store.add_memory(_make_memory(key="dietary_preference", value="vegetarian"), turn_id=1)
+        store.add_memory(_make_memory(key="user_name", value="Arjun"), turn_id=2)
+
+        [embedding] = store.embed_batch(["food diet"])
+        assert [i for i, _ in store.search_embedding(embedding, top_k=5)] == [
+            i for i, _ in store.search_vector("food diet", top_k=5)
+        ]
+
+    def test_load_embeddings_returns_stored_vectors_in_order(self, store):
+        ids = store.add_memories(
+            [_make_memory(key="a", value="alpha"), _make_memory(key="b", value="beta")],
+            turn_id=1,
+        )
+        loaded = store.load_embeddings([ids[1], ids[0]])
+        expected = store.embed_batch(["b: beta", "a: alpha"])
+        assert loaded.dtype == "float32"
+        assert loaded == pytest.approx(expected, abs=1e-6)
+
+    def test_load_embeddings_missing_id(self, store):
+        with pytest.raises(KeyError):
+            store.load_embeddings(["mem_missing"])
+
+    def test_embed_batch_shape(self, store):
+        batch = store.embed_batch(["one", "two", "three"])
+        assert batch.shape == (3, MemoryStore.EMBEDDING_DIM)
+        assert batch.dtype == "float32"
+        assert store.embed_batch([]).shape == (0, MemoryStore.EMBEDDING_DIM)
+
+    def test_iter_active_embeddings_skips_inactive(self, store):
+        ids = store.add_memories(
+            [_make_memory(key=f"k{i}", value=f"value {i}") for i in range(5)],
+            turn_id=1,
+        )
+        store.deactivate_by_id(ids[0])
+        streamed = dict(store.iter_active_embeddings(batch_size=2))
+        assert set(streamed) == set(ids[1:])
+        assert streamed[ids[1]] == pytest.approx(store.load_embeddings([ids[1]])[0])
+
+    def test_iter_active_memories_matches_list(self, store):
+        store.add_memories(
+            [_make_memory(key=f"k{i}", value=f"v{i}", confidence=i / 10) for i in range(5)],
+            turn_id=1,
+        )
+        streamed = list(store.iter_active_memories(batch_size=2))
+        assert [m.id for m in streamed] == [m.id for m in store.get_active_memories()]
+        assert [m.confidence for m in streamed] == [0.4, 0.3, 0.2, 0.1, 0.0]
+
 
 # ---------------------------------------------------------------------------
 # Search: FTS
@@ -252,6 +365,77 @@ class TestRowidMapping:
         mapped_id = store.rowid_to_memory_id(99999)
         assert mapped_id is None
 
+    def test_rowids_to_memory_ids(self, store):
+        ids = store.add_memories(
+            [_make_memory(key="a", value="alpha"), _make_memory(key="b", value="beta")],
+            turn_id=1,
+        )
+        rowids = [
+            store.db.execute("SELECT rowid FROM memories WHERE id = ?", (i,)).fetchone()[0]
+            for i in ids
+        ]
+
+        mapped = store.rowids_to_memory_ids(rowids + [99999])
+        assert mapped == dict(zip(rowids, ids))
+
+    def test_get_memories_by_ids_skips_inactive(self, store):
+        id_a = store.add_memory(_make_memory(key="a", value="alpha"), turn_id=1)
+        id_b = store.add_memory(_make_memory(key="b", value="beta"), turn_id=1)
+        store.deactivate_by_id(id_b)
+
+        found = store.get_memories_by_ids([id_a, id_b, "mem_missing"])
+        assert list(found) == [id_a]
+        assert found[id_a].value == "alpha"
+
+
+# ---------------------------------------------------------------------------
+# Embedding prefetch
+# ---------------------------------------------------------------------------
+
+class TestPrefetchEmbedding:
+    def test_prefetched_embedding_is_reused(self, store, monkeypatch):
+        calls = []
+        encode = store.embedder.encode
+        monkeypatch.setattr(store.embedder, "encode", lambda t: calls.append(t) or encode(t))
+
+        store.prefetch_embedding("What is my name?")
+        store.embed("What is my name?")
+        assert calls == ["What is my name?"]
+
+    def test_repeated_query_is_encoded_once(self, store, monkeypatch):
+        calls = []
+        encode = store.embedder.encode
+        monkeypatch.setattr(store.embedder, "encode", lambda t: calls.append(t) or encode(t))
+
+        first = store.embed("Where do I live?")
+        assert store.embed("Where do I live?") == first
+        assert calls == ["Where do I live?"]
+
+
+class TestEmbeddingCache:
+    def test_same_text_reuses_cached_vector(self, store, monkeypatch):
+        first_id = store.add_memory(_make_memory(key="city", value="Pune"), turn_id=1)
+
+        calls = []
+        encode = store.embedder.encode
+        monkeypatch.setattr(store.embedder, "encode", lambda t: calls.append(t) or encode(t))
+        second_id = store.add_memories(
+            [_make_memory(key="city", value="Pune"), _make_memory(key="pet", value="cat")],
+            turn_id=2,
+        )[0]
+
+        assert calls == [["pet: cat"]]
+        stored = store.load_embeddings([first_id, second_id])
+        assert stored[0] == pytest.approx(stored[1])
+
+    def test_cache_persists_across_stores(self, tmp_path):
+        db_path = str(tmp_path / "cache.db")
+        MemoryStore(db_path).add_memory(_make_memory(key="a", value="b"), turn_id=1)
+        rows = MemoryStore(db_path).db.execute(
+            "SELECT model FROM embedding_cache"
+        ).fetchall()
+        assert [r["model"] for r in rows] == [MemoryStore.EMBEDDING_MODEL]
+
 
 # ---------------------------------------------------------------------------
 # Profile
@@ -280,6 +464,21 @@ class TestProfile:
         profile = store.get_profile()
         assert profile == {}
 
+    def test_cached_profile_sees_later_adds(self, store):
+        assert store.get_profile() == {}
+        version = store.profile_version
+
+        store.add_memory(
+            _make_memory(key="fav_color", value="blue", mem_type="preference"),
+            turn_id=1,
+        )
+        assert store.get_profile() == {"fav_color": "blue"}
+        assert store.profile_version > version
+
+    def test_returned_profile_is_a_copy(self, store):
+        store.get_profile()["injected"] = "x"
+        assert "injected" not in store.get_profile()
+
 
 # ---------------------------------------------------------------------------
 # Turn logging
@@ -306,6 +505,33 @@ class TestTurnLogging:
         last_id = store.get_last_turn_id()
         assert last_id == 1
 
+    def test_log_stores_retrieved_count(self, store):
+        store.log_turn(1, "user", "Hello", memories_retrieved=["mem_abc", "mem_def"])
+        store.log_turn(2, "user", "Bye")
+
+        counts = dict(store.db.execute(
+            "SELECT turn_id, retrieved_count FROM turns ORDER BY turn_id"
+        ).fetchall())
+        assert counts == {1: 2, 2: 0}
+
+    def test_retrieved_count_backfilled_on_open(self, tmp_path):
+        db_path = str(tmp_path / "legacy.db")
+        legacy = sqlite3.connect(db_path)
+        legacy.execute(
+            "CREATE TABLE turns (turn_id INTEGER PRIMARY KEY, role TEXT NOT NULL, "
+            "content TEXT NOT NULL, timestamp REAL NOT NULL, "
+            "memories_retrieved TEXT DEFAULT '[]')"
+        )
+        legacy.execute(
+            "INSERT INTO turns VALUES (1, 'user', 'hi', 0, '[\"mem_a\", \"mem_b\"]')"
+        )
+        legacy.commit()
+        legacy.close()
+
+        store = MemoryStore(db_path)
+        row = store.db.execute("SELECT retrieved_count FROM turns WHERE turn_id = 1").fetchone()
+        assert row[0] == 2
+
 
 # ---------------------------------------------------------------------------
 # active_count
@@ -329,6 +555,68 @@ class TestActiveCount:
         store.deactivate_by_key("a")
         assert store.active_count() == 1
 
+    def test_count_after_deactivate_by_id(self, store):
+        mem_id = store.add_memory(_make_memory(key="a", value="1"), turn_id=1)
+        assert store.active_count() == 1
+
+        store.deactivate_by_id(mem_id)
+        store.deactivate_by_id(mem_id)  # already inactive: no double count
+        assert store.active_count() == 0
+
+    def test_count_after_deactivate_by_ids(self, store):
+        id_a = store.add_memory(_make_memory(key="a", value="1"), turn_id=1)
+        id_b = store.add_memory(_make_memory(key="b", value="2"), turn_id=1)
+        store.add_memory(_make_memory(key="c", value="3"), turn_id=1)
+
+        store.deactivate_by_id(id_a)
+        store.deactivate_by_ids([id_a, id_b, "mem_missing"])
+        assert [m.key for m in store.get_active_memories()] == ["c"]
+        assert store.active_count() == 1
+
+    def test_deactivate_by_ids_across_chunks(self, store, monkeypatch):
+        monkeypatch.setattr(store, "IN_CHUNK", 2)
+        ids = store.add_memories(
+            [_make_memory(key=f"k{i}", value=str(i)) for i in range(5)], turn_id=1
+        )
+        assert store.active_count() == 5
+        store.deactivate_by_ids(ids[:4] + ["mem_missing"])
+        assert [m.key for m in store.get_active_memories()] == ["k4"]
+        assert store.active_count() == 1
+        assert store.load_embeddings(ids).shape == (5, MemoryStore.EMBEDDING_DIM)
+
+    def test_lookups_across_chunks(self, store, monkeypatch):
+        monkeypatch.setattr(store, "IN_CHUNK", 2)
+        ids = store.add_memories(
+            [_make_memory(key=f"k{i}", value=str(i)) for i in range(5)], turn_id=1
+        )
+        assert set(store.get_memories_by_ids(ids)) == set(ids)
+        assert set(store.find_by_keys([f"k{i}" for i in range(5)])) == {f"k{i}" for i in range(5)}
+
+        rowids = [r["rowid"] for r in store.db.execute("SELECT rowid FROM memories")]
+        assert sorted(store.rowids_to_memory_ids(rowids).values()) == sorted(ids)
+
+        store.touch_memories(ids, turn_id=7)
+        assert {m.last_used_turn for m in store.get_active_memories()} == {7}
+
+    def test_count_after_deactivate_below_confidence(self, store):
+        store.add_memory(_make_memory(key="a", value="1", confidence=0.2), turn_id=1)
+        store.add_memory(_make_memory(key="b", value="2", confidence=0.9), turn_id=1)
+        assert store.active_count() == 2
+
+        assert store.deactivate_below_confidence(0.3) == 1
+        assert store.active_count() == 1
+        assert store.deactivate_below_confidence(0.3) == 0
+
+    def test_cached_count_matches_db(self, store):
+        store.active_count()
+        store.add_memory(_make_memory(key="a", value="1"), turn_id=1)
+        store.add_memory(_make_memory(key="a", value="2"), turn_id=2)
+        store.deactivate_by_key("a")
+        db_count = store.db.execute(
+            "SELECT COUNT(*) FROM memories WHERE is_active = 1"
+        ).fetchone()[0]
+        assert store.active_count() == db_count == 0
+
 
 # ---------------------------------------------------------------------------
 # Snapshot
@@ -349,3 +637,48 @@ class TestSnapshot:
         with open(expected_file) as f:
             content = f.read()
         assert "Arjun" in content
+
+
+# ---------------------------------------------------------------------------
+# Batched writes
+# ---------------------------------------------------------------------------
+
+class TestBatch:
+    def test_batch_defers_commit(self, store):
+        with store.batch():
+            store.add_memory(_make_memory(key="a", value="1"), turn_id=1)
+            store.log_turn(1, "user", "hello")
+            assert store.db.in_transaction
+
+        assert not store.db.in_transaction
+        assert store.active_count() == 1
+
+    def test_nested_batch_commits_once(self, store):
+        with store.batch():
+            with store.batch():
+                store.touch_memory("mem_missing", 3)
+                store.log_turn(1, "user", "hello")
+            assert store.db.in_transaction
+        assert not store.db.in_transaction
+
+    def test_writes_commit_outside_batch(self, store):
+        store.log_turn(1, "user", "hello")
+        assert not store.db.in_transaction
+
+    def test_savepoint_commits_on_success(self, store):
+        with store.savepoint():
+            store.log_turn(1, "user", "hello")
+        assert not store.db.in_transaction
+        assert store.get_last_turn_id() == 1
+
+    def test_savepoint_rolls_back_only_its_block(self, store):
+        with store.batch():
+            store.log_turn(1, "user", "hello")
+            with pytest.raises(RuntimeError):
+                with store.savepoint():
+                    store.log_turn(2, "user", "lost")
+                    raise RuntimeError("request failed")
+            store.log_turn(3, "user", "again")
+        assert not store.db.in_transaction
+        turns = [r["turn_id"] for r in store.db.execute("SELECT turn_id FROM turns")]
+        assert turns == [1, 3]